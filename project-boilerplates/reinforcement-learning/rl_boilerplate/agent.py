@@ -2,13 +2,16 @@
 Agent module.
 """
 
+import copy
 import random
+import numpy as np
 import torch
 import torch.nn
 import tensorflow as tf
 
-from rl_boilerplate import network
+from rl_boilerplate import network, replay
 from rl_boilerplate.config import CFG
+from rl_boilerplate.metrics import METRICS
 
 
 class Agent:
@@ -37,7 +40,7 @@ class RandomAgent(Agent):
     A random playing agent class.
     """
 
-    def set(self, obs_old, act, rwd, obs_new):
+    def set(self, obs_old, act, rwd, obs_new, done=False):
         """
         A random agent doesn't learn.
         """
@@ -50,35 +53,185 @@ class RandomAgent(Agent):
         return act_space.sample()
 
 
-class DQNAgent_pt(Agent):
+class ReplayAgent(Agent):
+    """
+    A learning agent parent class, learning from mini-batches of past transitions sampled from a replay buffer (see replay.py) instead of from the last transition only.
+    """
+
+    def __init__(self, x_dim):
+        self.buffer = replay.get_buffer(x_dim)
+        self.n_steps = 0
+        self.n_updates = 0
+
+    def set(self, obs_old, act, rwd, obs_new, done=False):
+        """
+        Store a (s, a, r, s') tuple, then learn from a sampled mini-batch every CFG.learn_every steps.
+        """
+        self.buffer.add(obs_old, act, rwd, obs_new, done)
+        self.n_steps += 1
+        if self.n_steps % CFG.learn_every == 0:
+            self.learn_step()
+
+    def set_batch(self, obs_old, act, rwd, obs_new, done):
+        """
+        Store a batch of (s, a, r, s') tuples (e.g. collected by actors, see distributed.py), then perform as many learning steps as set would have.
+        """
+        self.buffer.add_batch(obs_old, act, rwd, obs_new, done)
+        n_learn = (self.n_steps + len(act)) // CFG.learn_every - self.n_steps // CFG.learn_every
+        self.n_steps += len(act)
+        for _ in range(n_learn):
+            self.learn_step()
+
+    def learn_step(self):
+        """
+        Learn from a sampled mini-batch, then update the target network.
+        """
+        # Wait for enough transitions to sample diverse mini-batches
+        if len(self.buffer) < max(CFG.learn_start, CFG.batch_size):
+            return
+        batch = self.buffer.sample(CFG.batch_size)
+        td_errors = self.learn(batch)
+        self.buffer.update_priorities(batch["idx"], td_errors)
+
+        # Move the target network towards the online network
+        self.n_updates += 1
+        if CFG.target_tau > 0:
+            self.update_target(CFG.target_tau)
+        elif self.n_updates % CFG.target_sync_every == 0:
+            self.update_target(1.0)
+
+    def learn(self, batch):
+        """
+        Perform one learning step on a mini-batch (a dict of arrays, see replay.py). Returns the TD error of each transition.
+        """
+        raise NotImplementedError
+
+    def update_target(self, tau):
+        """
+        Set target network weights to tau * online weights + (1 - tau) * target weights. tau=1 is a hard sync.
+        """
+        raise NotImplementedError
+
+    def get_weights(self):
+        """
+        Returns the weights of the online network, as a list of NumPy arrays.
+        """
+        raise NotImplementedError
+
+    def set_weights(self, weights):
+        """
+        Set the weights of the online network from a list of NumPy arrays, as returned by get_weights.
+        """
+        raise NotImplementedError
+
+
+class DQNAgent_pt(ReplayAgent):
     """
     A basic pytorch Deep Q-learning agent.
+    Its networks are compiled as set by CFG.torch_compile (see network.py), and observations go through a preallocated buffer, so that no tensor is allocated per action. On GPU, mini-batches go through pinned buffers too.
     """
 
     def __init__(self, x_dim, y_dim):
-        self.net = network.DQN_pt(x_dim, y_dim)
-        self.opt = torch.optim.Adam(self.net.parameters(), lr=0.0001)
+        super().__init__(x_dim)
+        # Intra-op parallelism costs more than it saves on small networks
+        if CFG.torch_num_threads:
+            torch.set_num_threads(CFG.torch_num_threads)
+        self.device = torch.device(CFG.device)
 
-    def set(self, obs_old, act, rwd, obs_new):
+        net = network.DQN_pt(x_dim, y_dim).to(self.device)
+        # The target network is a frozen copy of the online network, only updated by update_target
+        target = copy.deepcopy(net).requires_grad_(False)
+        self.net = network.compile_pt(net, CFG.torch_compile)
+        self.target = network.compile_pt(target, CFG.torch_compile)
+        # The fused Adam kernel updates all parameters at once, instead of one per-parameter loop
+        try:
+            self.opt = torch.optim.Adam(self.net.parameters(), lr=0.0001, fused=True)
+        except (RuntimeError, TypeError):
+            # Older pytorch versions have no fused kernel for this device (or at all)
+            self.opt = torch.optim.Adam(self.net.parameters(), lr=0.0001)
+
+        # Reusable host buffers for a single observation and for mini-batches, with NumPy views to fill them in place
+        pin = self.device.type == "cuda"
+        self._obs_buf = torch.empty((1, x_dim), dtype=torch.float32, pin_memory=pin)
+        self._obs_np = self._obs_buf.numpy()
+        # On CPU, mini-batches are wrapped without any copy instead
+        self._batch_bufs = self._get_batch_bufs(x_dim, pin) if pin else {}
+
+    @staticmethod
+    def _get_batch_bufs(x_dim, pin):
+        """
+        Returns a host buffer for each field of a mini-batch, with a NumPy view to fill it in place.
+        """
+        bufs = {}
+        for name, shape, dtype in (
+            ("obs_old", (CFG.batch_size, x_dim), torch.float32),
+            ("act", (CFG.batch_size,), torch.int64),
+            ("rwd", (CFG.batch_size,), torch.float32),
+            ("obs_new", (CFG.batch_size, x_dim), torch.float32),
+            ("done", (CFG.batch_size,), torch.float32),
+            ("weights", (CFG.batch_size,), torch.float32),
+        ):
+            buf = torch.empty(shape, dtype=dtype, pin_memory=pin)
+            bufs[name] = (buf, buf.numpy())
+        return bufs
+
+    def _to_device(self, batch, name):
+        """
+        Returns a field of a mini-batch as a tensor on the agent device.
+        """
+        if name not in self._batch_bufs:
+            # Shares memory with the NumPy array, no copy
+            return torch.from_numpy(batch[name]).to(self.device)
+        buf, buf_np = self._batch_bufs[name]
+        buf_np[...] = batch[name]
+        return buf.to(self.device, non_blocking=True)
+
+    def learn(self, batch):
         """
-        Learn from a single observation sample.
+        Learn from a mini-batch of observation samples.
         """
-        obs_new = torch.tensor(obs_new)
+        obs_old, act, rwd, obs_new, done, weights = (
+            self._to_device(batch, name) for name in ("obs_old", "act", "rwd", "obs_new", "done", "weights")
+        )
 
-        # We get the network output
-        out = self.net(torch.tensor(obs_new))[act]
+        # We get the network output for the actions taken
+        out = torch.take_along_dim(self.net(obs_old), act[:, None], dim=1)[:, 0]
 
-        # We compute the target
+        # We compute the target from the target network, without bootstrapping past terminal states
         with torch.no_grad():
-            exp = rwd + CFG.gamma * self.net(obs_new).max()
+            val_new = self.target(obs_new).max(dim=1).values
+            exp = rwd + CFG.gamma * (1 - done) * val_new
 
-        # Compute the loss
-        loss = torch.square(exp - out)
+        # Compute the loss, weighted by importance weights of prioritized sampling
+        td_errors = exp - out
+        loss = (weights * torch.square(td_errors)).mean()
 
         # Perform a backward propagation.
-        self.opt.zero_grad()
-        loss.sum().backward()
+        self.opt.zero_grad(set_to_none=True)
+        loss.backward()
         self.opt.step()
+        METRICS.log("loss", loss.detach())
+        return td_errors.detach().cpu().numpy()
+
+    def update_target(self, tau):
+        """
+        Update the target network towards the online network.
+        """
+        with torch.no_grad():
+            for param_target, param in zip(self.target.parameters(), self.net.parameters()):
+                if tau == 1:
+                    param_target.copy_(param)
+                else:
+                    param_target.lerp_(param, tau)
+
+    def get_weights(self):
+        # Copies: NumPy arrays would otherwise share memory with the parameters of a CPU network
+        return [param.detach().cpu().numpy().copy() for param in self.net.parameters()]
+
+    def set_weights(self, weights):
+        with torch.no_grad():
+            for param, weight in zip(self.net.parameters(), weights):
+                param.copy_(torch.from_numpy(weight))
 
     def get(self, obs_new, act_space):
         """
@@ -88,42 +241,91 @@ class DQNAgent_pt(Agent):
         if random.uniform(0, 1) < CFG.epsilon:
             return act_space.sample()
         # Else, return action with highest value
-        with torch.no_grad():
+        with torch.inference_mode():
+            self._obs_np[0] = obs_new
             # Get the values of all possible actions
-            val = self.net(torch.tensor(obs_new))
+            val = self.net(self._obs_buf.to(self.device, non_blocking=True))
             # Choose the highest-values action
-            return torch.argmax(val).numpy()
+            return int(torch.argmax(val))
 
-class DQNAgent_tf(Agent):
+class DQNAgent_tf(ReplayAgent):
     """
     A basic tensorflow Deep Q-learning agent.
+    Its training step and greedy policy are compiled into TF graphs, traced once thanks to their fixed input signatures.
     """
 
     def __init__(self, x_dim, y_dim):
+        super().__init__(x_dim)
         self.net = network.DQN_tf(x_dim, y_dim)
+        self.target = network.DQN_tf(x_dim, y_dim)
+        # Build both networks so that their weights exist, then start from the same weights
+        self.net(tf.zeros((1, x_dim)))
+        self.target(tf.zeros((1, x_dim)))
+        self.update_target(1.0)
         self.opt = tf.optimizers.Adam(learning_rate=0.0001)
+        # Create the optimizer slots now, as creating variables in the first call of a tf.function traces it twice
+        self.opt.build(self.net.trainable_variables)
+
+        # Any batch size is accepted without retracing
+        obs_spec = tf.TensorSpec((None, x_dim), tf.float32)
+        vec_spec = tf.TensorSpec((None,), tf.float32)
+        self._train_step = tf.function(
+            self._train_step,
+            input_signature=[obs_spec, tf.TensorSpec((None,), tf.int64), vec_spec, obs_spec, vec_spec, vec_spec],
+        )
+        self._greedy_act = tf.function(self._greedy_act, input_signature=[obs_spec])
 
-    def set(self, obs_old, act, rwd, obs_new):
+    def _train_step(self, obs_old, act, rwd, obs_new, done, weights):
         """
-        Learn from a single observation sample.
+        Forward pass, loss, gradients and optimizer update on a mini-batch. Returns the loss and the TD errors.
+        Note that CFG.gamma is read once, when the step is traced.
         """
 
-        obs_new = obs_new.reshape(1, -1)
+        # We compute the target from the target network, without bootstrapping past terminal states
+        val_new = tf.reduce_max(self.target(obs_new), axis=1)
+        exp = rwd + CFG.gamma * (1 - done) * val_new
 
         with tf.GradientTape() as tape:
 
-            # We get the network output
-            out = self.net(obs_new)[0, act]
+            # We get the network output for the actions taken
+            out = tf.gather(self.net(obs_old), act, axis=1, batch_dims=1)
 
-            # We compute the target
-            exp = rwd + CFG.gamma * tf.reduce_max(self.net(obs_new))
-
-            # Compute the loss
-            loss = tf.square(exp - out)
-            print(loss)
+            # Compute the loss, weighted by importance weights of prioritized sampling
+            td_errors = exp - out
+            loss = tf.reduce_mean(weights * tf.square(td_errors))
 
         grads = tape.gradient(loss, self.net.trainable_variables)
         self.opt.apply_gradients(zip(grads, self.net.trainable_variables))
+        return loss, td_errors
+
+    def _greedy_act(self, obs):
+        """
+        Returns the highest-valued action of each observation.
+        """
+        return tf.argmax(self.net(obs), axis=1)
+
+    def learn(self, batch):
+        """
+        Learn from a mini-batch of observation samples.
+        """
+        loss, td_errors = self._train_step(
+            batch["obs_old"], batch["act"], batch["rwd"], batch["obs_new"], batch["done"], batch["weights"]
+        )
+        METRICS.log("loss", loss)
+        return td_errors.numpy()
+
+    def update_target(self, tau):
+        """
+        Update the target network towards the online network.
+        """
+        for var_target, var in zip(self.target.variables, self.net.variables):
+            var_target.assign(var if tau == 1 else tau * var + (1 - tau) * var_target)
+
+    def get_weights(self):
+        return self.net.get_weights()
+
+    def set_weights(self, weights):
+        self.net.set_weights(weights)
 
     def get(self, obs_new, act_space):
         """
@@ -133,5 +335,4 @@ class DQNAgent_tf(Agent):
         if random.uniform(0, 1) < CFG.epsilon:
             return act_space.sample()
         # Else, return action with highest value
-        with torch.no_grad():
-            return tf.argmax(self.net(obs_new.reshape(1, -1)), axis=1).numpy()[0]
+        return self._greedy_act(np.asarray(obs_new, dtype=np.float32).reshape(1, -1)).numpy()[0]
@@ -22,6 +22,31 @@ class Configuration:
         self.rnd_seed = None
         self.agt_type = None
 
+        # Experience replay (see replay.py)
+        self.buffer_size = 100_000
+        self.batch_size = 64
+        self.learn_start = 1_000
+        self.learn_every = 1
+        self.prioritized = False
+        self.per_alpha = 0.6
+        self.per_beta = 0.4
+
+        # Target network: Polyak averaging with rate target_tau after each learning step if target_tau > 0, else hard sync every target_sync_every learning steps
+        self.target_sync_every = 1_000
+        self.target_tau = 0.0
+
+        # Pytorch agents: compilation of networks ("script", "compile" or None), number of CPU threads (None keeps the pytorch default) and device. At the default network size on CPU, "script" speeds up action selection (~1.5x) but is deprecated by recent pytorch versions, and "compile" only adds overhead: networks run eagerly by default
+        self.torch_compile = None
+        self.torch_num_threads = 1
+        self.device = "cpu"
+
+        # Actor/learner training (see distributed.py): number of actor processes, transitions per chunk sent to the learner, chunks in flight per actor, learning steps between two policy snapshots, and CPU threads per actor
+        self.n_actors = 4
+        self.actor_chunk = 64
+        self.actor_slots = 4
+        self.policy_sync_every = 100
+        self.actor_threads = 1
+
     def init(self, agt_type, **kwargs):
         """
         User-defined configuration init. Mandatory to properly set all configuration parameters.
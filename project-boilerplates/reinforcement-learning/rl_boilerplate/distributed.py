@@ -0,0 +1,234 @@
+"""
+Distributed module.
+
+This module decouples experience collection from learning, so that environment simulation and gradient steps overlap on a multi-core machine. Several actor processes each run their own copy of the environment with a snapshot of the policy, and stream (s, a, r, s') tuples to a single learner (the calling process), which stores them in its replay buffer and trains on mini-batches.
+
+Transitions never go through pipes: each actor owns a few slots of a shared memory block, fills one with a chunk of transitions, and only sends the slot index to the learner, which hands it back once copied. The learner periodically publishes the weights of its network to another shared memory block, which actors poll after each chunk.
+"""
+
+import functools
+import importlib
+import multiprocessing as mp
+import os
+import queue
+import random
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from rl_boilerplate import environment
+from rl_boilerplate.config import CFG
+from rl_boilerplate.metrics import METRICS
+
+
+class SharedArrays:
+    """
+    NumPy arrays laid out in a single shared memory block. Only the block name is pickled, so that these arrays can be sent to other processes without copying them.
+    specs maps array names to their (shape, dtype)
+    """
+
+    def __init__(self, specs, name=None):
+        self.specs = specs
+        sizes = [int(np.prod(shape)) * np.dtype(dtype).itemsize for shape, dtype in specs.values()]
+        self.shm = SharedMemory(name=name, create=name is None, size=max(1, sum(sizes)))
+        self.arrays = {}
+        offset = 0
+        for (key, (shape, dtype)), size in zip(specs.items(), sizes):
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            offset += size
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def __getstate__(self):
+        return self.specs, self.shm.name
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def close(self):
+        """
+        Detach from the shared memory block. Arrays can no longer be used.
+        """
+        self.arrays = {}
+        self.shm.close()
+
+    def unlink(self):
+        """
+        Free the shared memory block. Must be called once, by the process which created it.
+        """
+        self.close()
+        self.shm.unlink()
+
+
+class PolicySnapshot:
+    """
+    The latest weights published by the learner, with a version number, in shared memory.
+    """
+
+    def __init__(self, weights, lock):
+        specs = {f"w{i}": (weight.shape, weight.dtype) for i, weight in enumerate(weights)}
+        specs["version"] = ((1,), np.int64)
+        self.arrays = SharedArrays(specs)
+        self.lock = lock
+        self.push(weights)
+
+    def push(self, weights):
+        """
+        Publish new weights.
+        """
+        with self.lock:
+            for i, weight in enumerate(weights):
+                self.arrays[f"w{i}"][...] = weight
+            self.arrays["version"][0] += 1
+
+    def pull(self, agt, version):
+        """
+        Load the published weights into an agent if they are newer than version. Returns the version of the agent weights.
+        """
+        with self.lock:
+            latest = int(self.arrays["version"][0])
+            if latest == version:
+                return version
+            weights = [self.arrays[f"w{i}"].copy() for i in range(len(self.arrays.specs) - 1)]
+        agt.set_weights(weights)
+        return latest
+
+
+def get_transition_specs(x_dim, n_actors):
+    """
+    Returns the specs of the shared transition slots of all actors (see SharedArrays).
+    """
+    shape = (n_actors, CFG.actor_slots, CFG.actor_chunk)
+    return dict(
+        obs_old=((*shape, x_dim), np.float32),
+        act=(shape, np.int64),
+        rwd=(shape, np.float32),
+        obs_new=((*shape, x_dim), np.float32),
+        done=(shape, np.float32),
+    )
+
+
+def run_actor(actor_id, cfg, agent_path, x_dim, y_dim, env_fn, transitions, snapshot, free_slots, full_slots, stop):
+    """
+    Actor process loop: play in its own environment with the latest policy snapshot, and send chunks of transitions to the learner.
+    agent_path is the (module, class name) of the agent, only imported once thread caps are set
+    """
+    # Cap the threads of each actor before pytorch and TensorFlow get imported, so that actors and learner don't oversubscribe cores
+    n_threads = str(cfg["actor_threads"])
+    os.environ["OMP_NUM_THREADS"] = n_threads
+    os.environ["MKL_NUM_THREADS"] = n_threads
+    os.environ["TF_NUM_INTRAOP_THREADS"] = n_threads
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    module, name = agent_path
+    agent_cls = getattr(importlib.import_module(module), name)
+
+    # Actors get their own random seed, and a minimal replay buffer since they do not learn
+    CFG.__dict__.update(cfg, buffer_size=1, torch_num_threads=cfg["actor_threads"])
+    if CFG.rnd_seed is not None:
+        CFG.rnd_seed += actor_id + 1
+    random.seed(CFG.rnd_seed)
+    agt = agent_cls(x_dim, y_dim)
+    version = snapshot.pull(agt, 0)
+
+    env = env_fn()
+    act_space = env.action_space
+    act_space.seed(CFG.rnd_seed)
+    obs_old, info = env.reset(seed=CFG.rnd_seed)
+    episode_rwd = 0.0
+
+    while not stop.is_set():
+        # Wait for the learner to hand back a slot
+        try:
+            slot = free_slots.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+        chunk = {key: transitions[key][actor_id, slot] for key in transitions.specs}
+        for i in range(CFG.actor_chunk):
+            act = agt.get(obs_old, act_space)
+            obs_new, rwd, terminated, truncated, _ = env.step(act)
+            chunk["obs_old"][i] = obs_old
+            chunk["act"][i] = act
+            chunk["rwd"][i] = rwd
+            chunk["obs_new"][i] = obs_new
+            chunk["done"][i] = terminated
+
+            obs_old = obs_new
+            episode_rwd += rwd
+            if terminated or truncated:
+                full_slots.put(("episode", actor_id, episode_rwd))
+                episode_rwd = 0.0
+                obs_old, info = env.reset()
+
+        full_slots.put(("chunk", actor_id, slot))
+        version = snapshot.pull(agt, version)
+
+    env.close()
+
+
+def run_actor_learner(agent_cls, x_dim, y_dim, n_steps, n_actors=None, env_fn=None):
+    """
+    Train an agent on n_steps transitions collected by n_actors actor processes (CFG.n_actors by default). Returns the trained learner agent.
+    env_fn creates the environment of each actor (a picklable callable, environment.get_env without rendering by default)
+    Actors are spawned, hence re-import the main module: call this function under an `if __name__ == "__main__":` guard.
+    """
+    n_actors = n_actors or CFG.n_actors
+    env_fn = env_fn or functools.partial(environment.get_env, render_mode=None)
+    ctx = mp.get_context("spawn")
+
+    agt = agent_cls(x_dim, y_dim)
+    transitions = SharedArrays(get_transition_specs(x_dim, n_actors))
+    snapshot = PolicySnapshot(agt.get_weights(), ctx.Lock())
+    free_slots = [ctx.Queue() for _ in range(n_actors)]
+    full_slots = ctx.Queue()
+    stop = ctx.Event()
+    # Actors import the agent class themselves: unpickling it would import pytorch and TensorFlow before run_actor caps their threads
+    agent_path = (agent_cls.__module__, agent_cls.__qualname__)
+    for actor_free_slots in free_slots:
+        for slot in range(CFG.actor_slots):
+            actor_free_slots.put(slot)
+
+    actors = [
+        ctx.Process(
+            target=run_actor,
+            args=(i, dict(CFG.__dict__), agent_path, x_dim, y_dim, env_fn, transitions, snapshot, free_slots[i], full_slots, stop),
+            daemon=True,
+        )
+        for i in range(n_actors)
+    ]
+    for actor in actors:
+        actor.start()
+
+    try:
+        n_collected = 0
+        n_published = agt.n_updates
+        while n_collected < n_steps:
+            try:
+                kind, actor_id, value = full_slots.get(timeout=1)
+            except queue.Empty:
+                if not any(actor.is_alive() for actor in actors):
+                    raise RuntimeError("All actors have exited")
+                continue
+            if kind == "episode":
+                METRICS.log("episode_rwd", value)
+                continue
+
+            # Copy the chunk into the replay buffer and learn from it, then hand the slot back to its actor
+            agt.set_batch(*(transitions[key][actor_id, value] for key in ("obs_old", "act", "rwd", "obs_new", "done")))
+            free_slots[actor_id].put(value)
+            n_collected += CFG.actor_chunk
+
+            if agt.n_updates - n_published >= CFG.policy_sync_every:
+                snapshot.push(agt.get_weights())
+                n_published = agt.n_updates
+    finally:
+        stop.set()
+        for actor in actors:
+            actor.join(timeout=10)
+            if actor.is_alive():
+                actor.terminate()
+        transitions.unlink()
+        snapshot.arrays.unlink()
+
+    return agt
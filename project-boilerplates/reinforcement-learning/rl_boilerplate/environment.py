@@ -8,13 +8,14 @@ import gymnasium as gym
 from tqdm import tqdm
 
 from rl_boilerplate.config import CFG
+from rl_boilerplate.metrics import METRICS
 
-def get_env():
+def get_env(render_mode="human"):
     """
     Returns a gym environment. Replace by a custom environment if needed.
     """
     # We use the LunarLander env. Other environments are available.
-    return gym.make("LunarLander-v2", render_mode="human")
+    return gym.make("LunarLander-v2", render_mode=render_mode)
 
 
 def run_env(env, agt, run_number):
@@ -40,12 +41,16 @@ def run_env(env, agt, run_number):
         obs_new, rwd, terminated, truncated, _ = env.step(act)
 
         # We perform a learning step.
-        agt.set(obs_old, act, rwd, obs_new)
+        agt.set(obs_old, act, rwd, obs_new, terminated)
 
         # Update latest observation
         obs_old = obs_new
 
         if terminated or truncated:
-            obs_end, info = env.reset()
+            obs_old, info = env.reset()
 
     env.close()
+
+    # We report the metrics agents logged during this run
+    for name, metric in METRICS.flush().items():
+        print(f"{name}: {metric['mean']:.4g} (mean of {metric['count']})")
@@ -0,0 +1,47 @@
+"""
+Metrics module.
+
+This module defines a singleton-type metrics sink, used by agents to log scalar values (e.g. their loss) at every learning step. Values are only aggregated on the fly, so that logging costs no I/O: a summary of each metric is reported once per run (see environment.py).
+"""
+
+from collections import defaultdict
+
+
+class Metrics:
+    """
+    Running sums and counts of scalar metrics, summarized as means.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Forget all logged values.
+        """
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def log(self, name, value):
+        """
+        Add a value (a number, or a scalar array or tensor) to the metric `name`.
+        """
+        self.totals[name] += float(value)
+        self.counts[name] += 1
+
+    def summary(self):
+        """
+        Returns the mean and number of values of each metric.
+        """
+        return {name: dict(mean=self.totals[name] / count, count=count) for name, count in self.counts.items()}
+
+    def flush(self):
+        """
+        Returns the summary of all metrics, then resets them.
+        """
+        summary = self.summary()
+        self.reset()
+        return summary
+
+
+METRICS = Metrics()
@@ -31,6 +31,20 @@ class DQN_pt(torch.nn.Module):
     def forward(self, obs):
         return self.net(obs)
 
+
+def compile_pt(net, mode):
+    """
+    Returns a compiled version of a pytorch network, sharing its parameters.
+    mode is "script" (TorchScript), "compile" (torch.compile) or None (no compilation)
+    """
+    if mode == "script":
+        return torch.jit.script(net)
+    if mode == "compile":
+        return torch.compile(net)
+    if mode is None:
+        return net
+    raise ValueError(f"Unknown compilation mode: {mode}")
+
 class DQN_tf(tf.keras.Model):
     """
     Tensorflow implementation of a Deep Q-Network with 3 linear layers.
@@ -0,0 +1,164 @@
+"""
+Replay buffer module.
+
+This module stores the (s, a, r, s') transitions generated by the environment, so that agents can learn from random mini-batches of past experience instead of one transition at a time. Transitions are written into preallocated contiguous NumPy arrays used as a ring: once the buffer is full, the oldest transitions are overwritten. No Python object is created per transition, and a mini-batch is gathered with a single fancy-indexing operation per field.
+"""
+
+import numpy as np
+
+from rl_boilerplate.config import CFG
+
+
+class ReplayBuffer:
+    """
+    A ring buffer of transitions, sampled uniformly.
+    obs_dim refers to the number of dimensions of an observation
+    capacity refers to the maximum number of transitions kept in memory
+    """
+
+    def __init__(self, obs_dim, capacity, seed=None):
+        self.capacity = capacity
+        self.obs_old = np.zeros((capacity, obs_dim), dtype=np.float32)
+        self.act = np.zeros(capacity, dtype=np.int64)
+        self.rwd = np.zeros(capacity, dtype=np.float32)
+        self.obs_new = np.zeros((capacity, obs_dim), dtype=np.float32)
+        self.done = np.zeros(capacity, dtype=np.float32)
+        # Next position to write to, and number of transitions stored
+        self.pos = 0
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, obs_old, act, rwd, obs_new, done=False):
+        """
+        Store a single transition, overwriting the oldest one if the buffer is full.
+        """
+        idx = self.pos
+        self.obs_old[idx] = obs_old
+        self.act[idx] = act
+        self.rwd[idx] = rwd
+        self.obs_new[idx] = obs_new
+        self.done[idx] = done
+        self._advance(np.array([idx]))
+
+    def add_batch(self, obs_old, act, rwd, obs_new, done):
+        """
+        Store a batch of transitions (arrays with the same first dimension) in one vectorized write.
+        """
+        n = len(act)
+        # Only the last `capacity` transitions of an oversized batch would survive anyway
+        if n > self.capacity:
+            obs_old, act, rwd, obs_new, done = (x[-self.capacity:] for x in (obs_old, act, rwd, obs_new, done))
+            n = self.capacity
+        idx = (self.pos + np.arange(n)) % self.capacity
+        self.obs_old[idx] = obs_old
+        self.act[idx] = act
+        self.rwd[idx] = rwd
+        self.obs_new[idx] = obs_new
+        self.done[idx] = done
+        self._advance(idx)
+
+    def _advance(self, idx):
+        """
+        Move the write position past the transitions just written at positions idx.
+        """
+        self.pos = (self.pos + len(idx)) % self.capacity
+        self.size = min(self.size + len(idx), self.capacity)
+
+    def _gather(self, idx, weights):
+        return dict(
+            obs_old=self.obs_old[idx],
+            act=self.act[idx],
+            rwd=self.rwd[idx],
+            obs_new=self.obs_new[idx],
+            done=self.done[idx],
+            weights=weights,
+            idx=idx,
+        )
+
+    def sample(self, batch_size):
+        """
+        Return a mini-batch of transitions sampled uniformly with replacement, as a dict of arrays. Importance weights are all ones.
+        """
+        idx = self.rng.integers(0, self.size, size=batch_size)
+        return self._gather(idx, np.ones(batch_size, dtype=np.float32))
+
+    def update_priorities(self, idx, td_errors):
+        """
+        Uniform sampling ignores priorities.
+        """
+        return
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    A ring buffer of transitions, sampled proportionally to their priority (https://arxiv.org/abs/1511.05952).
+    Priorities are stored in a sum-tree: a flat array where each node holds the sum of its two children, and leaves hold transition priorities. Sampling and updating a batch are both O(batch_size * log(capacity)), vectorized over the batch.
+    alpha controls how much prioritization is used (0 means uniform sampling)
+    beta controls how much importance weights correct the sampling bias (1 means full correction)
+    """
+
+    def __init__(self, obs_dim, capacity, alpha=0.6, beta=0.4, eps=1e-6, seed=None):
+        super().__init__(obs_dim, capacity, seed=seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.eps = eps
+        # Number of leaves is the next power of two, so that the tree is complete
+        self.n_leaves = 1 << max(0, (capacity - 1).bit_length())
+        self.depth = self.n_leaves.bit_length() - 1
+        self.tree = np.zeros(2 * self.n_leaves, dtype=np.float64)
+        self.max_priority = 1.0
+
+    def _advance(self, idx):
+        # New transitions get the highest priority seen so far, so that they are sampled at least once
+        self._set_priorities(idx, np.full(len(idx), self.max_priority ** self.alpha))
+        super()._advance(idx)
+
+    def _set_priorities(self, idx, priorities):
+        """
+        Write leaf priorities, then recompute the sums of their ancestors, one tree level at a time.
+        """
+        nodes = np.asarray(idx) + self.n_leaves
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def sample(self, batch_size):
+        """
+        Return a mini-batch sampled proportionally to priorities, with its importance weights (normalized to a maximum of 1).
+        """
+        total = self.tree[1]
+        # Stratified sampling: one value in each of batch_size equal segments of the total priority
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+        nodes = np.ones(batch_size, dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            go_right = values > self.tree[left]
+            values = np.where(go_right, values - self.tree[left], values)
+            nodes = left + go_right
+        # Rounding errors may point past the last stored transition
+        idx = np.minimum(nodes - self.n_leaves, self.size - 1)
+
+        probs = self.tree[idx + self.n_leaves] / total
+        weights = (self.size * np.maximum(probs, 1e-12)) ** -self.beta
+        return self._gather(idx, (weights / weights.max()).astype(np.float32))
+
+    def update_priorities(self, idx, td_errors):
+        """
+        Set the priorities of sampled transitions from their absolute TD errors.
+        """
+        priorities = np.abs(td_errors) + self.eps
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self._set_priorities(idx, priorities ** self.alpha)
+
+
+def get_buffer(obs_dim):
+    """
+    Returns the replay buffer defined by the configuration.
+    """
+    if CFG.prioritized:
+        return PrioritizedReplayBuffer(obs_dim, CFG.buffer_size, alpha=CFG.per_alpha, beta=CFG.per_beta, seed=CFG.rnd_seed)
+    return ReplayBuffer(obs_dim, CFG.buffer_size, seed=CFG.rnd_seed)
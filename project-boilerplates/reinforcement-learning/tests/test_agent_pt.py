@@ -0,0 +1,101 @@
+"""Check the compiled pytorch path of DQNAgent_pt against an eager reference"""
+
+import warnings
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from rl_boilerplate.agent import DQNAgent_pt
+from rl_boilerplate.config import CFG
+from rl_boilerplate.replay import ReplayBuffer
+
+X_DIM, Y_DIM = 8, 4
+
+
+@pytest.fixture
+def batch():
+    buffer = ReplayBuffer(X_DIM, capacity=256, seed=0)
+    rng = np.random.default_rng(0)
+    n = 256
+    buffer.add_batch(rng.random((n, X_DIM)), rng.integers(Y_DIM, size=n), rng.random(n), rng.random((n, X_DIM)), rng.random(n) < 0.1)
+    return buffer.sample(64)
+
+
+@pytest.fixture
+def get_agent(monkeypatch):
+    """Returns a function building an agent compiled as torch_compile, with the given weights if any"""
+
+    def get_agent(torch_compile, weights=None):
+        monkeypatch.setattr(CFG, "torch_compile", torch_compile)
+        with warnings.catch_warnings():
+            # torch.jit.script is deprecated by recent pytorch versions
+            warnings.simplefilter("ignore", FutureWarning)
+            agt = DQNAgent_pt(X_DIM, Y_DIM)
+        if weights is not None:
+            agt.set_weights(weights)
+            agt.update_target(1.0)
+        return agt
+
+    return get_agent
+
+
+def reference_td_errors(agt, batch):
+    """Eager TD errors, computed sample by sample"""
+    td_errors = []
+    with torch.no_grad():
+        for i in range(len(batch["act"])):
+            q_old = agt.net(torch.from_numpy(batch["obs_old"][i]))[batch["act"][i]]
+            q_new = agt.target(torch.from_numpy(batch["obs_new"][i])).max()
+            td_errors.append(batch["rwd"][i] + CFG.gamma * (1 - batch["done"][i]) * q_new - q_old)
+    return np.array(td_errors)
+
+
+@pytest.mark.parametrize("torch_compile", ["script", "compile"])
+def test_compiled_agent_matches_eager_agent(get_agent, torch_compile, batch):
+    eager = get_agent(None)
+    compiled = get_agent(torch_compile, eager.get_weights())
+    obs = torch.from_numpy(batch["obs_old"])
+    with torch.no_grad():
+        torch.testing.assert_close(compiled.net(obs), eager.net(obs))
+
+    expected = reference_td_errors(eager, batch)
+    np.testing.assert_allclose(eager.learn(batch), expected, rtol=1e-4, atol=1e-6)
+    np.testing.assert_allclose(compiled.learn(batch), expected, rtol=1e-4, atol=1e-6)
+    # Same update from the same loss
+    for weight_compiled, weight_eager in zip(compiled.get_weights(), eager.get_weights()):
+        np.testing.assert_allclose(weight_compiled, weight_eager, rtol=1e-4, atol=1e-6)
+
+
+def test_greedy_action_reuses_its_input_buffer(get_agent, batch, monkeypatch):
+    agt = get_agent(None)
+    monkeypatch.setattr(CFG, "epsilon", 0.0)
+    buf = agt._obs_buf.data_ptr()
+    with torch.no_grad():
+        expected = agt.net(torch.from_numpy(batch["obs_old"])).argmax(dim=1).numpy()
+    actions = [agt.get(obs, act_space=None) for obs in batch["obs_old"]]
+    np.testing.assert_array_equal(actions, expected)
+    assert agt._obs_buf.data_ptr() == buf
+
+
+def test_staged_batches_match_zero_copy_batches(get_agent, batch):
+    """Staging buffers (pinned on GPU) give the same learning step as mini-batches wrapped without copy"""
+    direct = get_agent(None)
+    staged = get_agent(None, direct.get_weights())
+    staged._batch_bufs = staged._get_batch_bufs(X_DIM, pin=False)
+    np.testing.assert_allclose(staged.learn(batch), direct.learn(batch), rtol=1e-6)
+
+
+def test_optimizer_falls_back_without_fused_adam(get_agent, batch, monkeypatch):
+    adam = torch.optim.Adam
+
+    def adam_without_fused_kernel(params, fused=None, **kwargs):
+        if fused:
+            raise RuntimeError("fused=True is not supported")
+        return adam(params, **kwargs)
+
+    monkeypatch.setattr(torch.optim, "Adam", adam_without_fused_kernel)
+    agt = get_agent(None)
+    assert not agt.opt.defaults["fused"]
+    assert np.isfinite(agt.learn(batch)).all()
@@ -0,0 +1,82 @@
+"""Check target network updates of both DQN agents, and that the tensorflow agent traces its graphs once"""
+
+import numpy as np
+import pytest
+
+from rl_boilerplate.agent import DQNAgent_pt, DQNAgent_tf
+from rl_boilerplate.config import CFG
+from rl_boilerplate.replay import ReplayBuffer
+
+X_DIM, Y_DIM = 8, 4
+
+
+def get_batch(batch_size, seed=0):
+    buffer = ReplayBuffer(X_DIM, capacity=256, seed=seed)
+    rng = np.random.default_rng(seed)
+    n = 256
+    buffer.add_batch(rng.random((n, X_DIM)), rng.integers(Y_DIM, size=n), rng.random(n), rng.random((n, X_DIM)), rng.random(n) < 0.1)
+    return buffer.sample(batch_size)
+
+
+def target_weights(agt):
+    if isinstance(agt, DQNAgent_tf):
+        return agt.target.get_weights()
+    return [param.detach().cpu().numpy().copy() for param in agt.target.parameters()]
+
+
+def perturb(agt, seed=0):
+    """Move the online network away from the target network"""
+    rng = np.random.default_rng(seed)
+    agt.set_weights([weight + rng.normal(size=weight.shape).astype(weight.dtype) for weight in agt.get_weights()])
+
+
+@pytest.fixture(params=[DQNAgent_pt, DQNAgent_tf], ids=["pt", "tf"])
+def agt(request, monkeypatch):
+    monkeypatch.setattr(CFG, "torch_compile", None)
+    monkeypatch.setattr(CFG, "buffer_size", 256)
+    return request.param(X_DIM, Y_DIM)
+
+
+def test_hard_sync_copies_online_weights(agt):
+    perturb(agt)
+    agt.update_target(1.0)
+    for weight_target, weight in zip(target_weights(agt), agt.get_weights()):
+        np.testing.assert_array_equal(weight_target, weight)
+
+
+def test_polyak_update_moves_target_by_tau(agt):
+    perturb(agt)
+    before = target_weights(agt)
+    agt.update_target(0.1)
+    for weight_target, weight_before, weight in zip(target_weights(agt), before, agt.get_weights()):
+        np.testing.assert_allclose(weight_target, weight_before + 0.1 * (weight - weight_before), rtol=1e-5, atol=1e-6)
+
+
+def test_learn_step_syncs_target_every_target_sync_every_updates(agt, monkeypatch):
+    monkeypatch.setattr(CFG, "learn_start", 0)
+    monkeypatch.setattr(CFG, "batch_size", 16)
+    monkeypatch.setattr(CFG, "target_tau", 0.0)
+    monkeypatch.setattr(CFG, "target_sync_every", 3)
+    batch = get_batch(32)
+    agt.buffer.add_batch(*(batch[key] for key in ("obs_old", "act", "rwd", "obs_new", "done")))
+    initial = target_weights(agt)
+    for _ in range(2):
+        agt.learn_step()
+    for weight_target, weight in zip(target_weights(agt), initial):
+        np.testing.assert_array_equal(weight_target, weight)
+    agt.learn_step()
+    assert agt.n_updates == 3
+    for weight_target, weight in zip(target_weights(agt), agt.get_weights()):
+        np.testing.assert_array_equal(weight_target, weight)
+
+
+def test_tf_train_step_and_greedy_policy_are_traced_once(monkeypatch):
+    monkeypatch.setattr(CFG, "epsilon", 0.0)
+    agt = DQNAgent_tf(X_DIM, Y_DIM)
+    # Different batch sizes and values do not retrace the train step
+    for i, batch_size in enumerate([64, 64, 32, 7]):
+        agt.learn(get_batch(batch_size, seed=i))
+    for obs in get_batch(10)["obs_old"]:
+        agt.get(obs, act_space=None)
+    assert agt._train_step.experimental_get_tracing_count() == 1
+    assert agt._greedy_act.experimental_get_tracing_count() == 1
@@ -0,0 +1,36 @@
+"""Smoke test of actor/learner training"""
+
+import functools
+from multiprocessing.shared_memory import SharedMemory
+
+import pytest
+
+pytest.importorskip("torch")
+gym = pytest.importorskip("gymnasium")
+
+from rl_boilerplate import distributed
+from rl_boilerplate.agent import DQNAgent_pt
+from rl_boilerplate.config import CFG
+
+
+def test_actor_learner_trains_and_unlinks_shared_memory(monkeypatch):
+    for key, value in dict(rnd_seed=0, torch_compile=None, learn_start=64, actor_chunk=32, actor_slots=2, policy_sync_every=10).items():
+        monkeypatch.setattr(CFG, key, value)
+    names = []
+
+    def recorded_shared_memory(*args, **kwargs):
+        shm = SharedMemory(*args, **kwargs)
+        names.append(shm.name)
+        return shm
+
+    monkeypatch.setattr(distributed, "SharedMemory", recorded_shared_memory)
+    env_fn = functools.partial(gym.make, "CartPole-v1")
+    agt = distributed.run_actor_learner(DQNAgent_pt, 4, 2, n_steps=320, n_actors=2, env_fn=env_fn)
+
+    assert agt.n_steps >= 320
+    assert agt.n_updates >= agt.n_steps - CFG.learn_start
+    # Transition slots and policy snapshot
+    assert len(names) == 2
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
@@ -0,0 +1,115 @@
+"""Check the ring buffer of uniform experience replay"""
+
+import numpy as np
+import pytest
+
+from rl_boilerplate.replay import PrioritizedReplayBuffer, ReplayBuffer
+
+OBS_DIM = 3
+
+
+def add_transitions(buffer, start, n):
+    """Add n transitions whose action (and observations) hold their insertion number, from start"""
+    for i in range(start, start + n):
+        buffer.add(np.full(OBS_DIM, i), i, float(i), np.full(OBS_DIM, i + 1), done=i % 2)
+
+
+def test_len_saturates_at_capacity():
+    buffer = ReplayBuffer(OBS_DIM, capacity=8)
+    assert len(buffer) == 0
+    add_transitions(buffer, 0, 5)
+    assert len(buffer) == 5
+    add_transitions(buffer, 5, 10)
+    assert len(buffer) == 8
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_oldest_transitions_are_overwritten_after_capacity_inserts(batched):
+    buffer = ReplayBuffer(OBS_DIM, capacity=8)
+    if batched:
+        # Two batches, the second one wrapping around the end of the arrays
+        for start, n in [(0, 6), (6, 5)]:
+            i = np.arange(start, start + n)
+            buffer.add_batch(np.repeat(i[:, None], OBS_DIM, axis=1), i, i.astype(float), i[:, None] + np.ones(OBS_DIM), i % 2)
+    else:
+        add_transitions(buffer, 0, 11)
+    assert buffer.pos == 11 % 8
+    # Transitions 8, 9 and 10 replaced 0, 1 and 2
+    np.testing.assert_array_equal(buffer.act, [8, 9, 10, 3, 4, 5, 6, 7])
+    np.testing.assert_array_equal(buffer.obs_old[:, 0], buffer.act)
+    np.testing.assert_array_equal(buffer.obs_new[:, 0], buffer.act + 1)
+
+
+def test_oversized_batch_keeps_its_last_transitions():
+    buffer = ReplayBuffer(OBS_DIM, capacity=4)
+    i = np.arange(10)
+    buffer.add_batch(np.zeros((10, OBS_DIM)), i, np.zeros(10), np.zeros((10, OBS_DIM)), np.zeros(10))
+    assert len(buffer) == 4
+    assert sorted(buffer.act) == [6, 7, 8, 9]
+
+
+def test_samples_stay_within_filled_region():
+    buffer = ReplayBuffer(OBS_DIM, capacity=100, seed=0)
+    add_transitions(buffer, 0, 10)
+    batch = buffer.sample(1_000)
+    assert batch["idx"].min() >= 0 and batch["idx"].max() < 10
+    assert set(batch["idx"]) == set(range(10))
+    np.testing.assert_array_equal(batch["act"], batch["idx"])
+
+
+def test_sampled_batch_dtypes_and_shapes():
+    buffer = ReplayBuffer(OBS_DIM, capacity=16, seed=0)
+    add_transitions(buffer, 0, 16)
+    batch = buffer.sample(5)
+    expected = dict(
+        obs_old=((5, OBS_DIM), np.float32),
+        act=((5,), np.int64),
+        rwd=((5,), np.float32),
+        obs_new=((5, OBS_DIM), np.float32),
+        done=((5,), np.float32),
+        weights=((5,), np.float32),
+    )
+    for key, (shape, dtype) in expected.items():
+        assert batch[key].shape == shape and batch[key].dtype == dtype, key
+    np.testing.assert_array_equal(batch["weights"], 1)
+
+
+def get_prioritized_buffer(n=4, capacity=8, priorities=(1.0, 2.0, 3.0, 4.0)):
+    """A prioritized buffer (alpha=1: sampling probabilities are proportional to priorities) with n transitions"""
+    buffer = PrioritizedReplayBuffer(OBS_DIM, capacity=capacity, alpha=1.0, beta=0.5, eps=0.0, seed=0)
+    add_transitions(buffer, 0, n)
+    buffer.update_priorities(np.arange(n), np.array(priorities))
+    return buffer
+
+
+def test_prioritized_sampling_follows_priorities():
+    buffer = get_prioritized_buffer()
+    batch = buffer.sample(100_000)
+    frequencies = np.bincount(batch["idx"], minlength=4) / len(batch["idx"])
+    np.testing.assert_allclose(frequencies, np.array([1, 2, 3, 4]) / 10, atol=1e-3)
+
+
+def test_new_transitions_get_the_max_priority():
+    buffer = get_prioritized_buffer(priorities=(1.0, 5.0, 2.0, 0.5))
+    add_transitions(buffer, 4, 2)
+    np.testing.assert_array_equal(buffer.tree[buffer.n_leaves + np.arange(6)], [1, 5, 2, 0.5, 5, 5])
+
+
+def test_update_priorities_changes_tree_total():
+    buffer = get_prioritized_buffer()
+    assert buffer.tree[1] == pytest.approx(10)
+    buffer.update_priorities(np.array([0, 3]), np.array([-6.0, 0.5]))
+    assert buffer.tree[1] == pytest.approx(6 + 2 + 3 + 0.5)
+    # Every inner node is the sum of its children
+    inner = np.arange(1, buffer.n_leaves)
+    np.testing.assert_allclose(buffer.tree[inner], buffer.tree[2 * inner] + buffer.tree[2 * inner + 1])
+
+
+def test_importance_weights_are_normalized():
+    buffer = get_prioritized_buffer()
+    batch = buffer.sample(64)
+    assert batch["weights"].dtype == np.float32
+    assert batch["weights"].max() == pytest.approx(1) and (batch["weights"] <= 1).all()
+    # Rarely sampled transitions get the largest weights
+    probs = buffer.tree[buffer.n_leaves + batch["idx"]] / buffer.tree[1]
+    np.testing.assert_allclose(batch["weights"], (probs / probs.min()) ** -0.5, rtol=1e-6)
@@ -0,0 +1,34 @@
+"""Check that incremental backtest steps cost the same early and late in a long series"""
+
+import time
+import pytest
+import numpy as np
+from ts_boilerplate.params import DATA, TRAIN
+from ts_boilerplate.incremental import IncrementalTrainer
+from ts_boilerplate.profiling import profile
+
+LENGTH = 100_000
+N_STEPS = 10
+REPLAY_SIZE = 64
+
+
+def run_incremental_steps(data, start_timestep):
+    """Returns (windows fine-tuned on per step, wall time per step)"""
+    trainer = IncrementalTrainer(data, replay_size=REPLAY_SIZE, seed=0, **TRAIN)
+    trainer.update(start_timestep, fit=False)
+    tic = time.perf_counter()
+    with profile(rss_interval=0) as profiler:
+        for step in range(1, N_STEPS + 1):
+            trainer.update(start_timestep + step)
+    return profiler.counters["incremental_windows"] / N_STEPS, (time.perf_counter() - tic) / N_STEPS
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_incremental_backtest_step_cost_does_not_grow():
+    data = np.random.rand(LENGTH, DATA['n_covariates'] + DATA['n_targets'])
+    windows_early, time_early = run_incremental_steps(data, 1_000)
+    windows_late, time_late = run_incremental_steps(data, LENGTH - 1_000)
+    print(f"\n### incremental backtest step: {time_early * 1e3:.1f}ms at t=1k vs {time_late * 1e3:.1f}ms at t=99k")
+    # Each step only touches the newly revealed window plus the replay buffer, wherever it is in the series
+    assert windows_early == windows_late == 1 + REPLAY_SIZE
@@ -0,0 +1,88 @@
+"""Time and memory benchmarks of the data path (windowing, folds, split, metrics, baseline backtest) at scaled sizes
+
+Run with pytest-benchmark, and store results to compare them release to release (see README.md):
+    pytest tests/benchmarks/test_bench_data_path.py --run-benchmarks --benchmark-autosave
+Peak memory (traced by `tracemalloc` on one extra call) is stored along timings, as `extra_info["peak_memory_MB"]`
+"""
+
+import os
+import functools
+import tracemalloc
+import pytest
+import numpy as np
+from ts_boilerplate.dataprep import get_folds, get_X_y, train_test_split
+from ts_boilerplate.generate_dummy_data import generate_data_monotonic_increase
+from ts_boilerplate.main import backtest
+from ts_boilerplate.metrics import mae, mape
+from ts_boilerplate.params import CROSS_VAL, DATA, MODEL, TRAIN
+
+pytest.importorskip("pytest_benchmark")
+
+N_FEATURES = DATA['n_covariates'] + DATA['n_targets']  # At least one column per target
+# (n_timesteps, n_features)
+SIZES = [(1_000, N_FEATURES), (100_000, N_FEATURES), (1_000_000, N_FEATURES), (100_000, 100)]
+if os.getenv("TS_BENCHMARK_FULL") == "1":
+    # Up to 8GB per series
+    SIZES += [(10_000_000, N_FEATURES), (1_000_000, 100), (10_000_000, 100)]
+SIZE_IDS = [f"{n_timesteps:.0e}x{n_features}" for n_timesteps, n_features in SIZES]
+# Number of backtest steps, whatever the size of the series
+N_BACKTEST_STEPS = 1_000
+
+pytestmark = [pytest.mark.slow]
+
+
+@functools.lru_cache(maxsize=1)
+def get_data(n_timesteps: int, n_features: int) -> np.ndarray:
+    return generate_data_monotonic_increase(length=n_timesteps, n_features=n_features)
+
+
+def peak_memory(function, *args, **kwargs) -> int:
+    """Returns the peak memory (bytes) allocated during one call of `function`"""
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(benchmark, function, *args, **kwargs):
+    benchmark.extra_info["peak_memory_MB"] = peak_memory(function, *args, **kwargs) / 2**20
+    return benchmark(function, *args, **kwargs)
+
+
+@pytest.mark.benchmark(group="get_X_y")
+@pytest.mark.parametrize("size", SIZES, ids=SIZE_IDS)
+def test_bench_get_X_y(benchmark, size):
+    run(benchmark, get_X_y, get_data(*size), shuffle=False, **TRAIN)
+
+
+@pytest.mark.benchmark(group="get_folds")
+@pytest.mark.parametrize("size", SIZES, ids=SIZE_IDS)
+def test_bench_get_folds(benchmark, size):
+    run(benchmark, get_folds, get_data(*size), **CROSS_VAL)
+
+
+@pytest.mark.benchmark(group="train_test_split")
+@pytest.mark.parametrize("size", SIZES, ids=SIZE_IDS)
+def test_bench_train_test_split(benchmark, size):
+    run(benchmark, train_test_split, get_data(*size), **TRAIN)
+
+
+@pytest.mark.benchmark(group="metrics")
+@pytest.mark.parametrize("size", SIZES, ids=SIZE_IDS)
+def test_bench_metrics(benchmark, size):
+    _, y = get_X_y(get_data(*size), shuffle=False, **TRAIN)
+
+    def metrics():
+        return mae(y[1:], y[:-1]), mape(y[1:], y[:-1])
+    run(benchmark, metrics)
+
+
+@pytest.mark.benchmark(group="backtest")
+@pytest.mark.parametrize("size", SIZES, ids=SIZE_IDS)
+def test_bench_baseline_backtest(benchmark, size, monkeypatch):
+    monkeypatch.setitem(MODEL, "baseline", "last_value")
+    data = get_data(*size)
+    start_ratio = 1 - N_BACKTEST_STEPS / len(data)
+    run(benchmark, backtest, data, start_ratio=max(start_ratio, 0.5), retrain_every=100)
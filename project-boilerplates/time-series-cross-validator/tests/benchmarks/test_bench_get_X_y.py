@@ -0,0 +1,31 @@
+"""Compare the strided `get_X_y` against the former loop-based implementation on a long series"""
+
+import time
+import pytest
+import numpy as np
+from ts_boilerplate.params import DATA
+from ts_boilerplate.dataprep import get_X_y
+
+PARAMS = dict(input_length=200, output_length=7, horizon=4, stride=1)
+LENGTH = 100_000
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_strided_get_X_y_is_faster_and_copy_free(X_y_loop):
+    data = np.random.rand(LENGTH, DATA['n_covariates'] + DATA['n_targets'])
+
+    start = time.perf_counter()
+    X, y = get_X_y(data, shuffle=False, **PARAMS)
+    time_strided = time.perf_counter() - start
+
+    start = time.perf_counter()
+    X_loop, y_loop = X_y_loop(data, **PARAMS)
+    time_loop = time.perf_counter() - start
+
+    print(f"\n### get_X_y on {data.shape}: strided {time_strided:.4f}s vs loop {time_loop:.4f}s "
+          f"({X_loop.nbytes / 1e6:.0f} MB copied by the loop)")
+    np.testing.assert_array_equal(X, X_loop)
+    np.testing.assert_array_equal(y, y_loop)
+    assert np.shares_memory(X, data)
+    assert time_strided < time_loop
@@ -0,0 +1,63 @@
+"""Check that trading metrics scale linearly with the number of series and timesteps"""
+
+import os
+import sys
+import time
+import pytest
+import numpy as np
+from ts_boilerplate.metrics import mase_per_series, play_trading_strategy, return_on_investment, sharpe_ratio
+
+N_TIMESTEPS = 10_000
+N_HORIZONS = 3
+
+
+def get_inputs(n_series, n_timesteps):
+    rng = np.random.default_rng(0)
+    y_true = np.exp(np.cumsum(rng.normal(scale=0.01, size=(n_series, n_timesteps)), axis=-1))
+    y_pred = y_true[..., None] * rng.normal(1, 0.01, size=(n_series, n_timesteps, N_HORIZONS))
+    return y_true, y_pred
+
+
+def trading_metrics(y_true, y_pred):
+    values = play_trading_strategy(y_true, y_pred)
+    return_on_investment(values)
+    sharpe_ratio(values)
+    mase_per_series(y_true, y_pred)
+
+
+def time_trading_metrics(n_series, n_timesteps):
+    y_true, y_pred = get_inputs(n_series, n_timesteps)
+    tic = time.perf_counter()
+    trading_metrics(y_true, y_pred)
+    return time.perf_counter() - tic
+
+
+def count_calls(n_series, n_timesteps):
+    """Returns the number of Python and C function calls made by the trading metrics"""
+    y_true, y_pred = get_inputs(n_series, n_timesteps)
+    calls = []
+    sys.setprofile(lambda frame, event, arg: calls.append(event) if event in ("call", "c_call") else None)
+    try:
+        trading_metrics(y_true, y_pred)
+    finally:
+        sys.setprofile(None)
+    return len(calls)
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_trading_metrics_scale_linearly():
+    # Fully vectorized: the same calls whatever the number of series and timesteps, no loop over any of them
+    assert count_calls(10, 100) == count_calls(100, 1_000) == count_calls(1_000, N_TIMESTEPS)
+    time_trading_metrics(10, N_TIMESTEPS)  # warm up
+    time_small = time_trading_metrics(100, N_TIMESTEPS)
+    time_large = time_trading_metrics(1_000, N_TIMESTEPS)
+    print(f"\n### trading metrics: {time_small:.3f}s for 1e6 values vs {time_large:.3f}s for 1e7 values")
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+@pytest.mark.skipif(os.getenv("TS_BENCHMARK_FULL") != "1",
+                    reason="Full size benchmark (10k series x 100k timesteps) needs tens of GB of RAM: set TS_BENCHMARK_FULL=1")
+def test_trading_metrics_full_size():
+    print(f"\n### trading metrics on 10k series x 100k timesteps: {time_trading_metrics(10_000, 100_000):.1f}s")
@@ -0,0 +1,38 @@
+"""Check that a saved TsPipeline loads and serves its first prediction much faster than it trains"""
+
+import time
+import pytest
+import numpy as np
+from ts_boilerplate.dataprep import get_X_y
+from ts_boilerplate.params import TRAIN
+from ts_boilerplate.pipeline import TsPipeline
+
+N_LOADS = 5
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_pipeline_loads_in_milliseconds(data_monotonic_increase, tmp_path):
+    X, y = get_X_y(data_monotonic_increase, **TRAIN, shuffle=False)
+    tic = time.perf_counter()
+    pipeline = TsPipeline()
+    pipeline.fit(X, y)
+    pipeline.predict_batch(X[:1])
+    time_fit = time.perf_counter() - tic
+    path = str(tmp_path / "pipeline.npz")
+    pipeline.save(path)
+
+    times_load, times_ready = [], []
+    for _ in range(N_LOADS):
+        tic = time.perf_counter()
+        loaded = TsPipeline.load(path)
+        times_load.append(time.perf_counter() - tic)
+        # The first prediction traces the compiled predict function
+        loaded.predict_batch(X[:1])
+        times_ready.append(time.perf_counter() - tic)
+    time_load, time_ready = np.median(times_load), np.median(times_ready)
+    print(f"\n### TsPipeline: load {time_load * 1e3:.0f}ms, first prediction after {time_ready * 1e3:.0f}ms, "
+          f"vs {time_fit:.2f}s to fit")
+    # Rebuilding the keras graph and tracing the predict function dominate: tens of milliseconds, not seconds
+    assert time_load < 0.5
+    assert time_ready < 1
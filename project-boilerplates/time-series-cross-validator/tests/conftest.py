@@ -1,7 +1,51 @@
 import pytest
 import numpy as np
 from ts_boilerplate.generate_dummy_data import generate_data_monotonic_increase, generate_data_zeros_and_ones, generate_X_y_zeros_and_ones
-from typing import Tuple
+from ts_boilerplate.generate_dummy_data import generate_data_seasonal, load_or_generate
+from ts_boilerplate.params import DATA
+from typing import Callable, Tuple
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-benchmarks", action="store_true", help="also run performance benchmarks (tests marked `benchmark`)")
+
+
+def pytest_configure(config):
+    # pytest-benchmark registers the `benchmark` marker itself
+    if not config.pluginmanager.hasplugin("benchmark"):
+        config.addinivalue_line("markers", "benchmark: performance benchmark, only run with --run-benchmarks")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Benchmarks are opt-in, so that the default test run stays fast"""
+    if config.getoption("--run-benchmarks"):
+        return
+    benchmarks = [item for item in items if item.get_closest_marker("benchmark") is not None]
+    if benchmarks:
+        config.hook.pytest_deselected(items=benchmarks)
+        items[:] = [item for item in items if item.get_closest_marker("benchmark") is None]
+
+
+def get_X_y_loop(data, input_length, output_length, horizon, stride, **kwargs):
+    """Reference implementation of `get_X_y`, appending one (Xi, yi) pair after another
+    (slices windows itself: `dataprep.get_Xi_yi` is removed from the challengified package)
+    """
+    X, y = [], []
+    for i in range(0, len(data), stride):
+        y_start = i + input_length + horizon - 1
+        Xi = data[i:i + input_length]
+        yi = data[y_start:y_start + output_length, DATA['target_column_idx']]
+        if len(yi) < output_length:
+            break
+        X.append(Xi)
+        y.append(yi)
+    return np.array(X), np.squeeze(np.array(y))
+
+
+@pytest.fixture(scope="session")
+def X_y_loop() -> Callable:
+    """Returns `get_X_y_loop`, the reference implementation of `get_X_y`"""
+    return get_X_y_loop
 
 @pytest.fixture(scope="session")
 def data_monotonic_increase() -> np.ndarray:
@@ -15,3 +59,25 @@ def data_zeros_and_ones() -> np.ndarray:
 @pytest.fixture(scope="session")
 def X_y_zeros_and_ones() -> Tuple[np.ndarray]:
     return generate_X_y_zeros_and_ones()
+
+
+@pytest.fixture(scope="session")
+def cached_data(pytestconfig, tmp_path_factory) -> Callable:
+    """Returns `load_or_generate` bound to the pytest cache directory (.pytest_cache/d/ts_fixtures):
+    large fixtures are generated once, then memory-mapped by later test sessions.
+    Falls back to a temporary directory when the cache is disabled (`-p no:cacheprovider`)
+    """
+    cache = getattr(pytestconfig, "cache", None)
+    cache_dir = str(cache.mkdir("ts_fixtures")) if cache is not None else str(tmp_path_factory.mktemp("ts_fixtures"))
+    return lambda generator, **kwargs: load_or_generate(cache_dir, generator, **kwargs)
+
+
+@pytest.fixture(scope="session")
+def data_seasonal(cached_data) -> np.ndarray:
+    return cached_data(generate_data_seasonal, seed=0)
+
+
+@pytest.fixture(scope="session")
+def data_seasonal_large(cached_data) -> np.ndarray:
+    """1M timesteps, in float32"""
+    return cached_data(generate_data_seasonal, length=1_000_000, dtype=np.float32, seed=0)
@@ -1,7 +1,14 @@
 """Tests that main route run without raising exceptions"""
 
 import pytest
+import numpy as np
+from ts_boilerplate.dataprep import get_X_y
 from ts_boilerplate.main import backtest, train, cross_validate
+from ts_boilerplate.metrics import mae
+from ts_boilerplate.model import fit_model, get_model, predict_output
+from ts_boilerplate.params import DATA, MODEL, TRAIN
+from ts_boilerplate.profiling import profile
+from ts_boilerplate.windowing import gather_windows
 
 @pytest.mark.slow
 def test_main_route_train(data_monotonic_increase):
@@ -14,3 +21,112 @@ def test_main_route_cross_validate(data_monotonic_increase):
 @pytest.mark.slow
 def test_backtest(data_monotonic_increase):
     backtest(data_monotonic_increase, print_metrics=False, plot_metrics=False)
+
+@pytest.mark.slow
+def test_cross_validate_in_parallel_matches_sequential(data_monotonic_increase):
+    metrics_cv = cross_validate(data_monotonic_increase)
+    metrics_cv_parallel, fold_times = cross_validate(data_monotonic_increase, n_jobs=2, return_fold_times=True)
+    assert len(fold_times) == len(metrics_cv)
+    assert metrics_cv_parallel == pytest.approx(metrics_cv)
+
+def test_cross_validate_in_parallel_uses_params_set_at_runtime(data_monotonic_increase, monkeypatch):
+    """Spawned workers re-import `params.py`: they should still use the params changed by the parent"""
+    monkeypatch.setitem(MODEL, "baseline", "drift")
+    monkeypatch.setitem(TRAIN, "input_length", 5)
+    metrics_cv = cross_validate(data_monotonic_increase)
+    assert metrics_cv == pytest.approx([0] * len(metrics_cv), abs=1e-6)
+    assert cross_validate(data_monotonic_increase, n_jobs=2) == pytest.approx(metrics_cv)
+
+@pytest.mark.slow
+@pytest.mark.parametrize("incremental", [False, True])
+def test_backtest_traces_its_pipeline_once(data_monotonic_increase, monkeypatch, incremental):
+    """A single `TsPipeline` is refitted at each retrain: its compiled predict is traced once for the whole backtest"""
+    pipelines = []
+
+    def get_model_spy(*args, **kwargs):
+        pipelines.append(get_model(*args, **kwargs))
+        return pipelines[-1]
+    monkeypatch.setattr("ts_boilerplate.main.get_model", get_model_spy)
+    monkeypatch.setattr("ts_boilerplate.incremental.get_model", get_model_spy)
+    with profile(rss_interval=0) as profiler:
+        backtest(data_monotonic_increase, start_ratio=0.8, retrain_every=20, incremental=incremental, replay_size=32)
+    assert profiler.counters["backtest_steps"] > 20
+    assert len(pipelines) == 1
+    assert pipelines[0]._predict_fn.experimental_get_tracing_count() == 1
+
+@pytest.mark.slow
+def test_backtest_incremental(data_monotonic_increase):
+    backtest(data_monotonic_increase, incremental=True, replay_size=32, print_metrics=False, plot_metrics=False)
+
+def backtest_per_step(data, stride, retrain_every, start_ratio=0.9):
+    """Reference backtest: one prediction per step, with a model retrained every `retrain_every` steps"""
+    start_timestep_0 = round(start_ratio * len(data))
+    _, y_test = get_X_y(data[start_timestep_0:], shuffle=False, **TRAIN)
+    y_pred = []
+    for i in range(0, len(y_test), stride):
+        if i % retrain_every == 0:
+            X_train, y_train = get_X_y(data[:start_timestep_0 + i], shuffle=False, **TRAIN)
+            model = get_model(X_train, y_train)
+            fit_model(model, X_train, y_train)
+        X_i, _ = gather_windows(data, np.array([start_timestep_0 + i]), **TRAIN)
+        y_pred.append(predict_output(model, X_i))
+    return mae(y_test[::stride], np.concatenate(y_pred))
+
+
+@pytest.mark.parametrize("retrain_every", [1, 3])
+def test_backtest_batched_predictions_match_per_step_predictions(retrain_every, monkeypatch):
+    """Steps sharing the same model are predicted in a single batch: the linear AR baseline makes
+    predictions depend on the data each model was trained on"""
+    monkeypatch.setitem(MODEL, "baseline", "linear_ar")
+    data = np.random.default_rng(0).random((300, DATA['n_covariates'] + DATA['n_targets']))
+    metrics_batched = backtest(data, stride=2, start_ratio=0.7, retrain=True, retrain_every=retrain_every)
+    metrics_per_step = backtest_per_step(data, stride=2, retrain_every=retrain_every, start_ratio=0.7)
+    assert metrics_batched == pytest.approx(metrics_per_step, rel=1e-6)
+
+
+@pytest.mark.slow
+def test_cross_validate_cache_skips_training(data_monotonic_increase, tmp_path, monkeypatch):
+    metrics_cv = cross_validate(data_monotonic_increase, cache_dir=str(tmp_path))
+
+    def fit_model_should_not_be_called(*args, **kwargs):
+        raise AssertionError("identical folds should not be trained again")
+
+    monkeypatch.setattr("ts_boilerplate.main.fit_model", fit_model_should_not_be_called)
+    assert cross_validate(data_monotonic_increase, print_metrics=True, cache_dir=str(tmp_path)) == pytest.approx(metrics_cv)
+
+
+@pytest.mark.slow
+def test_backtest_cache_reloads_fitted_weights(data_monotonic_increase, tmp_path, monkeypatch):
+    metrics = backtest(data_monotonic_increase, start_ratio=0.8, retrain_every=20, cache_dir=str(tmp_path))
+
+    def fit_model_should_not_be_called(*args, **kwargs):
+        raise AssertionError("identical retrains should reload their fitted weights")
+
+    monkeypatch.setattr("ts_boilerplate.main.fit_model", fit_model_should_not_be_called)
+    assert backtest(data_monotonic_increase, start_ratio=0.8, retrain_every=20, cache_dir=str(tmp_path)) == pytest.approx(metrics)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("change", ["learning_rate", "target_column_idx"])
+def test_cross_validate_cache_misses_when_predictions_may_change(data_monotonic_increase, tmp_path, monkeypatch, change):
+    cross_validate(data_monotonic_increase, max_folds=1, cache_dir=str(tmp_path))
+    if change == "learning_rate":
+        def get_model_with_other_learning_rate(*args, **kwargs):
+            model = get_model(*args, **kwargs)
+            model.model.optimizer.learning_rate.assign(0.01)
+            return model
+        monkeypatch.setattr("ts_boilerplate.main.get_model", get_model_with_other_learning_rate)
+    else:
+        monkeypatch.setitem(DATA, "target_column_idx", DATA['target_column_idx'][::-1])
+
+    fitted = []
+    monkeypatch.setattr("ts_boilerplate.main.fit_model", lambda *args, **kwargs: fitted.append(True))
+    cross_validate(data_monotonic_increase, max_folds=1, cache_dir=str(tmp_path))
+    assert fitted
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_backtest_with_numpy_baseline(data_monotonic_increase, monkeypatch, incremental):
+    monkeypatch.setitem(MODEL, "baseline", "linear_ar")
+    metrics = backtest(data_monotonic_increase, retrain_every=5, incremental=incremental)
+    assert metrics < 1e-3
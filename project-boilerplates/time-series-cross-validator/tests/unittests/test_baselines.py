@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+from ts_boilerplate.baselines import BASELINES
+from ts_boilerplate.dataprep import get_X_y
+from ts_boilerplate.model import fit_model, get_model, predict_output
+from ts_boilerplate.params import TRAIN
+from ts_boilerplate.sequence import WindowedSequence
+
+
+@pytest.mark.parametrize("baseline", list(BASELINES))
+def test_baselines_have_correct_output_shape(X_y_zeros_and_ones, baseline):
+    X, y = X_y_zeros_and_ones
+    model = get_model(X, y, baseline=baseline)
+    fit_model(model, X, y)
+    y_pred = predict_output(model, X)
+    assert y_pred.shape == y.shape
+    np.testing.assert_allclose(y_pred, y, atol=1e-6)
+
+
+def test_last_value_matches_keras_baseline(data_monotonic_increase):
+    X, y = get_X_y(data_monotonic_increase, **TRAIN, shuffle=False)
+    expected = predict_output(get_model(X, y), X)
+    np.testing.assert_allclose(predict_output(get_model(X, y, baseline="last_value"), X), expected, rtol=1e-5)
+
+
+def test_drift_and_linear_ar_are_exact_on_a_trend(data_monotonic_increase):
+    """On a linear series, y is a linear function of X"""
+    X, y = get_X_y(data_monotonic_increase, **TRAIN, shuffle=False)
+    np.testing.assert_allclose(predict_output(get_model(X, y, baseline="drift"), X), y)
+
+    seq = WindowedSequence(data_monotonic_increase, **TRAIN)
+    model = get_model(X, y, baseline="linear_ar")
+    fit_model(model, seq)
+    np.testing.assert_allclose(predict_output(model, seq), seq.targets(), atol=1e-6)
+
+
+def test_seasonal_naive_repeats_last_season():
+    seasonality = 3
+    data = np.tile(np.arange(seasonality, dtype=float), 100)[:, None] * np.ones((1, 5))
+    X, y = get_X_y(data, **TRAIN, shuffle=False)
+    model = get_model(X, y, baseline="seasonal_naive")
+    model.seasonality = seasonality
+    np.testing.assert_allclose(predict_output(model, X), y)
@@ -0,0 +1,22 @@
+import numpy as np
+from ts_boilerplate.cache import FoldCache, hash_array
+
+
+def test_cache_keys_are_content_addressed(data_monotonic_increase):
+    data_hash = hash_array(data_monotonic_increase)
+    assert data_hash == hash_array(data_monotonic_increase.copy())
+    assert data_hash != hash_array(data_monotonic_increase[:-1])
+    assert FoldCache.key(data_hash, dict(a=1, b=2)) == FoldCache.key(data_hash, dict(b=2, a=1))
+    assert FoldCache.key(data_hash, dict(a=1)) != FoldCache.key(data_hash, dict(a=2))
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = FoldCache(str(tmp_path), max_bytes=3 * 8_500)
+    for i in range(3):
+        cache.save(f"entry_{i}", values=np.zeros(1_000))
+    # entry_0 is used again, so that entry_1 becomes the least recently used one
+    np.testing.assert_array_equal(cache.load("entry_0")["values"], np.zeros(1_000))
+    cache.save("entry_3", values=np.zeros(1_000))
+    assert cache.load("entry_1") is None
+    assert cache.load("entry_0") is not None and cache.load("entry_3") is not None
+    assert cache.size() <= cache.max_bytes
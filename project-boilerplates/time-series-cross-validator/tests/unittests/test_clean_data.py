@@ -0,0 +1,54 @@
+import pytest
+import numpy as np
+import pandas as pd
+from ts_boilerplate.dataprep import clean_data
+
+
+@pytest.fixture
+def data_with_nans(data_monotonic_increase):
+    data = data_monotonic_increase.copy()
+    rng = np.random.default_rng(0)
+    data[rng.random(data.shape) < 0.2] = np.nan
+    data[:30, 0] = np.nan  # Leading NaNs spanning several blocks
+    data[100:260, 1] = np.nan  # Gap spanning several blocks
+    return data
+
+
+@pytest.mark.parametrize("method, expected", [
+    ("ffill", lambda df: df.ffill()),
+    ("interpolate", lambda df: df.interpolate()),
+])
+def test_chunked_clean_data_matches_pandas(data_with_nans, method, expected):
+    cleaned, n_imputed = clean_data(data_with_nans, method=method, chunk_size=16, return_report=True)
+    # Leading timesteps are dropped until every column has a valid value
+    expected = expected(pd.DataFrame(data_with_nans))
+    n_leading = int(expected.notna().all(axis=1).to_numpy().argmax())
+    assert n_leading >= 30
+    np.testing.assert_allclose(cleaned, expected.to_numpy()[n_leading:])
+    np.testing.assert_array_equal(n_imputed, np.isnan(data_with_nans[n_leading:]).sum(axis=0))
+
+
+@pytest.mark.parametrize("method", ["ffill", "interpolate"])
+def test_clean_data_never_back_fills_leading_nans(method):
+    data = np.array([[np.nan, 1.], [np.nan, np.nan], [5., 3.], [np.nan, 4.], [7., np.nan]])
+    cleaned = clean_data(data, method=method, chunk_size=2)
+    # Timesteps 0 and 1 have no past value of column 0: they are dropped rather than filled with 5
+    expected = {"ffill": [[5., 3.], [5., 4.], [7., 4.]], "interpolate": [[5., 3.], [6., 4.], [7., 4.]]}[method]
+    np.testing.assert_array_equal(cleaned, expected)
+
+
+def test_clean_data_rejects_columns_without_any_value(data_with_nans):
+    data = data_with_nans.copy()
+    data[:, 2] = np.nan
+    with pytest.raises(ValueError, match=r"columns \[2\]"):
+        clean_data(data, chunk_size=16)
+
+
+def test_clean_data_writes_into_a_memmap(tmp_path, data_with_nans):
+    out_path = str(tmp_path / "clean.npy")
+    cleaned = clean_data(data_with_nans, out=out_path, chunk_size=64)
+    assert isinstance(cleaned, np.memmap)
+    # Dropped leading timesteps are left as NaNs at the start of the file
+    written = np.load(out_path)
+    np.testing.assert_array_equal(written[len(written) - len(cleaned):], cleaned)
+    assert not np.isnan(cleaned).any()
@@ -0,0 +1,55 @@
+import pytest
+import itertools
+import numpy as np
+from ts_boilerplate.dataprep import get_folds, get_X_y, train_test_split
+from ts_boilerplate.folds import FOLD_METHODS, generate_folds
+from ts_boilerplate.main import cross_validate
+from ts_boilerplate.params import CROSS_VAL, MODEL, TRAIN
+
+FOLD_PARAMS = {key: value for key, value in CROSS_VAL.items() if key not in ('method', 'embargo')}
+
+
+@pytest.mark.parametrize("method,embargo", [("sliding", 0), ("expanding", 0), ("purged", 0), ("purged", 5)])
+def test_folds_have_no_data_leak(data_monotonic_increase, method, embargo):
+    """Same check as `test_no_data_leak`, on every fold"""
+    folds = list(generate_folds(len(data_monotonic_increase), method=method, embargo=embargo, **FOLD_PARAMS, **TRAIN))
+    assert len(folds) > 0
+    for train_slice, test_slice in folds:
+        _, y_train = get_X_y(data_monotonic_increase[train_slice], shuffle=False, **TRAIN)
+        _, y_test = get_X_y(data_monotonic_increase[test_slice], shuffle=False, **TRAIN)
+        gap = np.min(y_test) - np.max(y_train)
+        assert gap >= TRAIN["horizon"]
+        if method == "purged":
+            assert test_slice.start - train_slice.stop == embargo
+            assert gap >= TRAIN["horizon"] + TRAIN["input_length"] + embargo
+
+
+def test_sliding_folds_match_get_folds(data_monotonic_increase):
+    folds = generate_folds(len(data_monotonic_increase), method="sliding", **FOLD_PARAMS, **TRAIN)
+    for (train_slice, test_slice), fold in itertools.zip_longest(folds, get_folds(data_monotonic_increase, **CROSS_VAL)):
+        fold_train, fold_test = train_test_split(fold, **TRAIN)
+        np.testing.assert_array_equal(data_monotonic_increase[train_slice], fold_train)
+        np.testing.assert_array_equal(data_monotonic_increase[test_slice], fold_test)
+
+
+def test_expanding_folds_are_anchored(data_monotonic_increase):
+    sliding = generate_folds(len(data_monotonic_increase), method="sliding", **FOLD_PARAMS, **TRAIN)
+    expanding = generate_folds(len(data_monotonic_increase), method="expanding", **FOLD_PARAMS, **TRAIN)
+    for (train_sliding, test_sliding), (train_expanding, test_expanding) in zip(sliding, expanding):
+        assert train_expanding == slice(0, train_sliding.stop)
+        assert test_expanding == test_sliding
+
+
+def test_folds_are_generated_lazily():
+    folds = generate_folds(10**15, method="sliding", **FOLD_PARAMS, **TRAIN)
+    train_slice, test_slice = next(folds)
+    assert train_slice.start == 0 and test_slice.stop == CROSS_VAL["fold_length"]
+
+
+@pytest.mark.parametrize("method", FOLD_METHODS)
+def test_cross_validate_with_each_fold_method(data_monotonic_increase, monkeypatch, method):
+    monkeypatch.setitem(MODEL, "baseline", "drift")
+    monkeypatch.setitem(CROSS_VAL, "method", method)
+    metrics_cv = cross_validate(data_monotonic_increase)
+    assert len(metrics_cv) == len(get_folds(data_monotonic_increase, **CROSS_VAL))
+    assert np.allclose(metrics_cv, 0)
@@ -0,0 +1,31 @@
+import time
+import numpy as np
+from ts_boilerplate.generate_dummy_data import generate_data_monotonic_increase, generate_data_seasonal, generate_data_zeros_and_ones
+from ts_boilerplate.params import DATA
+
+
+def test_generators_accept_sizes_and_dtypes():
+    for generator in (generate_data_monotonic_increase, generate_data_zeros_and_ones, generate_data_seasonal):
+        assert generator().shape == (DATA['length'], DATA['n_covariates'] + DATA['n_targets'])
+        data = generator(length=1_000, n_features=10, dtype=np.float32)
+        assert data.shape == (1_000, 10)
+        assert data.dtype == np.float32
+
+
+def test_seasonal_data_is_reproducible_and_seasonal():
+    data = generate_data_seasonal(length=10_000, seasonality=24, trend=0., noise=0.01, seed=42)
+    np.testing.assert_array_equal(data, generate_data_seasonal(length=10_000, seasonality=24, trend=0., noise=0.01, seed=42))
+    assert not np.array_equal(data, generate_data_seasonal(length=10_000, seed=43))
+    # One season later, values repeat up to the noise
+    assert np.abs(data[24:] - data[:-24]).max() < 0.1
+    assert np.abs(data[12:] - data[:-12]).max() > 0.5
+
+
+def test_large_fixtures_are_cached_as_memmaps(data_seasonal_large, cached_data):
+    assert isinstance(data_seasonal_large, np.memmap)
+    assert data_seasonal_large.shape[0] == 1_000_000 and data_seasonal_large.dtype == np.float32
+    tic = time.perf_counter()
+    data = cached_data(generate_data_seasonal, length=1_000_000, dtype=np.float32, seed=0)
+    assert time.perf_counter() - tic < 0.5
+    assert data.filename == data_seasonal_large.filename
+    np.testing.assert_array_equal(data[-10:], data_seasonal_large[-10:])
@@ -0,0 +1,28 @@
+import sys
+import json
+import subprocess
+import pytest
+
+# Importing numpy alone takes ~0.1s: anything close to this limit means a heavy backend was imported eagerly
+IMPORT_TIME_LIMIT = 1.5  # seconds
+HEAVY_MODULES = ["tensorflow", "matplotlib", "pandas"]
+
+
+def _import_in_fresh_interpreter(module: str) -> dict:
+    """Import `module` in a new python process. Returns its import time and the heavy modules it loaded"""
+    code = (
+        "import sys, time, json\n"
+        "tic = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(json.dumps(dict(seconds=time.perf_counter() - tic,\n"
+        f"                     loaded=[m for m in {HEAVY_MODULES} if m in sys.modules])))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", ["ts_boilerplate.dataprep", "ts_boilerplate.main"])
+def test_import_does_not_load_heavy_backends(module):
+    result = _import_in_fresh_interpreter(module)
+    assert result["loaded"] == []
+    assert result["seconds"] < IMPORT_TIME_LIMIT
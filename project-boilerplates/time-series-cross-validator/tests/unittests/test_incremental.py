@@ -0,0 +1,12 @@
+import numpy as np
+from ts_boilerplate.params import TRAIN
+from ts_boilerplate.incremental import IncrementalTrainer
+from ts_boilerplate.windowing import get_window_starts
+
+
+def test_revealed_windows_are_extended_incrementally(data_monotonic_increase):
+    trainer = IncrementalTrainer(data_monotonic_increase, **TRAIN)
+    revealed = np.concatenate([trainer.reveal(end) for end in (100, 101, 150, 150, 300)])
+    expected_starts = get_window_starts(300, **TRAIN)
+    np.testing.assert_array_equal(revealed * TRAIN['stride'], expected_starts)
+    assert trainer.n_windows == len(expected_starts)
@@ -0,0 +1,38 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from ts_boilerplate.dataprep import load_data
+
+
+def test_load_data_memory_maps_a_binary_cache(tmp_path, data_monotonic_increase):
+    csv_path = str(tmp_path / "data.csv")
+    pd.DataFrame(data_monotonic_increase).to_csv(csv_path, index=False)
+
+    data = load_data(csv_path)
+    assert os.path.isfile(tmp_path / "data.npy")
+    np.testing.assert_array_equal(data, data_monotonic_increase)
+
+    data = load_data(csv_path)
+    assert isinstance(data, np.memmap) and not data.flags.writeable
+    np.testing.assert_array_equal(data, data_monotonic_increase)
+
+
+def test_load_data_rebuilds_cache_when_csv_changes(tmp_path, data_monotonic_increase):
+    csv_path = str(tmp_path / "data.csv")
+    pd.DataFrame(data_monotonic_increase).to_csv(csv_path, index=False)
+    load_data(csv_path)
+
+    pd.DataFrame(data_monotonic_increase[:10]).to_csv(csv_path, index=False)
+    assert load_data(csv_path, mmap=False).shape == (10, data_monotonic_increase.shape[1])
+
+
+def test_load_data_names_non_numeric_columns(tmp_path, data_monotonic_increase):
+    csv_path = str(tmp_path / "data.csv")
+    df = pd.DataFrame(data_monotonic_increase)
+    df.insert(0, "date", pd.date_range("2020-01-01", periods=len(df)).astype(str))
+    df["label"] = "a"
+    df.to_csv(csv_path, index=False)
+    with pytest.raises(ValueError, match=r"non-numeric columns \['date', 'label'\]"):
+        load_data(csv_path)
+    assert not os.path.isfile(tmp_path / "data.npy")
@@ -0,0 +1,59 @@
+import pytest
+import numpy as np
+from ts_boilerplate.params import DATA, TRAIN
+from ts_boilerplate.metrics import mae, mape, mase, StreamingMAE, StreamingMAPE, StreamingMASE
+from ts_boilerplate.metrics import mase_per_series, play_trading_strategy, return_on_investment, sharpe_ratio
+
+
+@pytest.fixture
+def y_true_y_pred():
+    rng = np.random.default_rng(0)
+    shape = (50, TRAIN['output_length'], DATA['n_targets'])
+    y_true = rng.uniform(1, 2, size=shape)
+    return np.squeeze(y_true), np.squeeze(y_true + rng.normal(size=shape))
+
+
+def test_metrics_match_their_definition(y_true_y_pred):
+    y_true, y_pred = y_true_y_pred
+    assert mae(y_true, y_pred) == pytest.approx(np.mean(np.abs(y_true - y_pred)))
+    assert mape(y_true, y_pred) == pytest.approx(100 * np.mean(np.abs((y_true - y_pred) / y_true)))
+    assert mase(y_true, y_true) == 0
+
+
+def test_metrics_breakdowns(y_true_y_pred):
+    y_true, y_pred = y_true_y_pred
+    assert mae(y_true, y_pred, breakdown="horizon").shape == (TRAIN['output_length'], )
+    assert mae(y_true, y_pred, breakdown="target").shape == (DATA['n_targets'], )
+    assert mae(y_true, y_pred, breakdown="horizon").mean() == pytest.approx(mae(y_true, y_pred))
+    with pytest.raises(ValueError):
+        mae(y_true, y_pred, breakdown="fold")
+
+
+@pytest.mark.parametrize("metric, accumulator", [(mae, StreamingMAE()), (mape, StreamingMAPE()), (mase, StreamingMASE())])
+def test_streaming_accumulators_match_batch_metrics(y_true_y_pred, metric, accumulator):
+    y_true, y_pred = y_true_y_pred
+    for batch in np.array_split(np.arange(len(y_true)), 4):
+        accumulator.update(y_true[batch], y_pred[batch])
+    assert accumulator.n_samples == len(y_true)
+    assert accumulator.finalize() == pytest.approx(metric(y_true, y_pred))
+    np.testing.assert_allclose(accumulator.finalize(breakdown="target"), metric(y_true, y_pred, breakdown="target"))
+
+
+def test_trading_strategy_on_a_batch_of_instruments():
+    prices = np.array([[1., 2., 4., 2.],
+                       [4., 2., 1., 2.]])
+    # Perfect forecasts of the next price, for 2 horizons
+    y_pred = np.stack([np.roll(prices, -1, axis=-1)] * 2, axis=-1)
+    values = play_trading_strategy(prices, y_pred)
+    np.testing.assert_allclose(values, [[1., 2., 4., 4.], [1., 1., 1., 2.]])
+    np.testing.assert_allclose(return_on_investment(values), [3., 1.])
+    assert return_on_investment(values[0]) == pytest.approx(3.)
+    assert sharpe_ratio(values).shape == (2, )
+    assert sharpe_ratio(np.ones(10)) == 0
+
+
+def test_mase_per_series_matches_naive_forecast():
+    y_true = np.cumsum(np.random.default_rng(0).normal(size=(3, 100)), axis=-1)
+    naive = np.concatenate([y_true[:, :1], y_true[:, :-1]], axis=-1)
+    np.testing.assert_allclose(mase_per_series(y_true, naive), 1, rtol=0.05)
+    assert mase_per_series(y_true, np.stack([naive, naive], axis=-1)).shape == (3, 2)
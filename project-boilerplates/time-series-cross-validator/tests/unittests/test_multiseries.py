@@ -0,0 +1,60 @@
+import pytest
+import numpy as np
+import pandas as pd
+from ts_boilerplate.main import cross_validate
+from ts_boilerplate import parallel
+from ts_boilerplate.multiseries import _evaluate_fold_in_worker, cross_validate_series, load_series
+from ts_boilerplate.params import MODEL, TRAIN
+
+
+@pytest.fixture
+def series_3D(data_monotonic_increase, data_zeros_and_ones) -> np.ndarray:
+    return np.stack([data_monotonic_increase, data_zeros_and_ones, 2 * data_monotonic_increase + 1])
+
+
+def test_multiseries_matches_cross_validate_per_series(series_3D, monkeypatch):
+    monkeypatch.setitem(MODEL, "baseline", "last_value")
+    table = cross_validate_series(series_3D, mode="local")
+    n_folds = table["fold"].nunique()
+    assert len(table) == len(series_3D) * n_folds
+    for i, data in enumerate(series_3D):
+        metrics_cv = table[table["series"] == str(i)].sort_values("fold")["mae"].to_numpy()
+        np.testing.assert_allclose(metrics_cv, cross_validate(data))
+
+
+def test_global_and_local_baselines_agree_when_nothing_is_learnt(series_3D):
+    table_global = cross_validate_series(series_3D, mode="global", baseline="drift")
+    table_local = cross_validate_series(series_3D, mode="local", baseline="drift")
+    pd.testing.assert_frame_equal(table_global, table_local)
+
+
+def test_multiseries_in_parallel_matches_sequential(series_3D, monkeypatch):
+    # Params set at runtime, which spawned workers should use too
+    monkeypatch.setitem(MODEL, "baseline", "drift")
+    monkeypatch.setitem(TRAIN, "input_length", 5)
+    table = cross_validate_series(series_3D, mode="local")
+    table_parallel = cross_validate_series(series_3D, mode="local", n_jobs=2)
+    pd.testing.assert_frame_equal(table, table_parallel)
+    # The drift of a linear series is exact
+    np.testing.assert_allclose(table[table["series"] == "0"]["mae"], 0, atol=1e-6)
+
+
+def test_worker_clears_keras_session_between_folds(series_3D, monkeypatch):
+    cleared = []
+    monkeypatch.setattr(parallel, "_data", series_3D)
+    monkeypatch.setattr(parallel, "clear_keras_session", lambda: cleared.append(True))
+    fold = (slice(0, 140), slice(140, 200))
+    for _ in range(2):
+        _evaluate_fold_in_worker(fold, np.arange(len(series_3D)), "global", "last_value")
+    assert len(cleared) == 2
+
+
+def test_load_series_from_directory(series_3D, tmp_path):
+    for name, data in zip(["a", "b"], series_3D):
+        pd.DataFrame(data).to_csv(tmp_path / f"{name}.csv", index=False)
+    np.save(tmp_path / "c.npy", series_3D[2])
+    data, names = load_series(str(tmp_path))
+    assert names == ["a", "b", "c"]
+    np.testing.assert_array_equal(data, series_3D)
+    # `.npy` caches written next to the CSVs by `load_data` are not loaded twice
+    assert load_series(str(tmp_path))[1] == ["a", "b", "c"]
@@ -0,0 +1,59 @@
+import numpy as np
+from ts_boilerplate.dataprep import get_X_y
+from ts_boilerplate.model import fine_tune_model, get_model, predict_output
+from ts_boilerplate.params import TRAIN
+from ts_boilerplate.pipeline import TsPipeline
+from ts_boilerplate.sequence import WindowedSequence
+
+
+def test_pipeline_predicts_like_its_model_on_unscaled_data(data_monotonic_increase):
+    X, y = get_X_y(data_monotonic_increase, **TRAIN, shuffle=False)
+    pipeline = TsPipeline()
+    pipeline.fit(X[:300], y[:300])
+    expected = get_model(X, y).predict(X[300:], verbose=0)
+    np.testing.assert_allclose(predict_output(pipeline, X[300:]), expected, rtol=1e-4)
+    assert pipeline.predict(X[300]).shape == y.shape[1:]
+
+
+def test_pipeline_is_traced_once_whatever_the_batch_size(data_monotonic_increase):
+    seq = WindowedSequence(data_monotonic_increase, **TRAIN, shuffle=False)
+    pipeline = TsPipeline()
+    pipeline.fit(seq)
+    X, _ = seq[0]
+    for batch_size in (1, 7, len(X)):
+        pipeline.predict_batch(X[:batch_size])
+    assert pipeline.predict_batch(seq).shape == seq.targets().shape
+    assert pipeline._predict_fn.experimental_get_tracing_count() == 1
+
+
+def test_pipeline_roundtrips_through_a_single_artifact(data_monotonic_increase, tmp_path):
+    X, y = get_X_y(data_monotonic_increase, **TRAIN, shuffle=False)
+    pipeline = TsPipeline()
+    pipeline.fit(X, y)
+    pipeline.partial_fit(X[-10:], y[-10:])
+    path = str(tmp_path / "pipeline.npz")
+    pipeline.save(path)
+    loaded = TsPipeline.load(path)
+    np.testing.assert_allclose(loaded.predict_batch(X), pipeline.predict_batch(X))
+
+
+def test_fine_tune_model_keeps_pipeline_scaling_and_trains_one_epoch(data_monotonic_increase, monkeypatch):
+    X, y = get_X_y(data_monotonic_increase, **TRAIN, shuffle=False)
+    pipeline = get_model(X, y, pipeline=True)
+    pipeline.fit(X[:300], y[:300])
+    X_mean, X_std = pipeline.X_mean.copy(), pipeline.X_std.copy()
+    fit_calls = []
+    monkeypatch.setattr(pipeline.model, "fit", lambda *args, **kwargs: fit_calls.append(kwargs))
+    fine_tune_model(pipeline, X[300:], y[300:], epochs=1)
+    np.testing.assert_array_equal(pipeline.X_mean, X_mean)
+    np.testing.assert_array_equal(pipeline.X_std, X_std)
+    assert len(fit_calls) == 1 and fit_calls[0]["epochs"] == 1
+
+
+def test_refitting_a_pipeline_does_not_retrace_it(data_monotonic_increase):
+    X, y = get_X_y(data_monotonic_increase, **TRAIN, shuffle=False)
+    pipeline = TsPipeline()
+    for end in (200, 300, 400):
+        pipeline.fit(X[:end], y[:end])
+        np.testing.assert_allclose(pipeline.predict_batch(X[end:]), get_model(X, y).predict(X[end:], verbose=0), rtol=1e-4)
+    assert pipeline._predict_fn.experimental_get_tracing_count() == 1
@@ -0,0 +1,44 @@
+import sys
+import json
+from ts_boilerplate import profiling
+from ts_boilerplate.main import train
+from ts_boilerplate.profiling import count, profile, timer
+
+
+def test_profiling_is_disabled_by_default():
+    assert profiling._profiler is None
+    assert timer("stage") is profiling._DISABLED
+    count("events")  # No-op
+
+
+def test_profile_train_stages(data_monotonic_increase, tmp_path):
+    with profile(rss_interval=0.001) as profiler:
+        train(data_monotonic_increase)
+    assert profiling._profiler is None
+
+    summary = profiler.summary()
+    for stage in ["train", "windowing", "get_model", "fit_model", "predict_output", "metrics"]:
+        assert summary["stages"][stage]["calls"] == 1
+    assert summary["stages"]["train"]["total_s"] >= summary["stages"]["fit_model"]["total_s"]
+    assert summary["counters"]["windows"] > 0
+    assert summary["counters"]["tf_retraces"] >= 1
+    assert summary["peak_rss_bytes"] > 0
+
+    profiler.to_json(str(tmp_path / "profile.json"))
+    with open(tmp_path / "profile.json") as f:
+        assert json.load(f)["stages"].keys() == summary["stages"].keys()
+    profiler.to_chrome_trace(str(tmp_path / "trace.json"))
+    with open(tmp_path / "trace.json") as f:
+        events = json.load(f)["traceEvents"]
+    assert {event["name"] for event in events if event["ph"] == "X"} == set(summary["stages"])
+    assert any(event["ph"] == "C" for event in events)
+
+
+def test_rss_falls_back_without_proc_nor_resource(monkeypatch):
+    """e.g. on Windows, without psutil: RSS is reported as 0 instead of failing"""
+    def open_without_proc(path, *args, **kwargs):
+        raise OSError(path)
+    monkeypatch.setattr("builtins.open", open_without_proc)
+    monkeypatch.setitem(sys.modules, "resource", None)
+    monkeypatch.setitem(sys.modules, "psutil", None)
+    assert profiling._current_rss() == 0
@@ -0,0 +1,59 @@
+import pytest
+import pandas as pd
+from ts_boilerplate.params import MODEL, TRAIN
+from ts_boilerplate.search import get_candidates, override_params, successive_halving
+
+SPACE = dict(baseline=["last_value", "moving_average", "drift", "seasonal_naive"], input_length=[5, 10])
+
+
+def test_override_params_restores_params():
+    input_length = TRAIN["input_length"]
+    with override_params(input_length=3, baseline="drift"):
+        assert TRAIN["input_length"] == 3 and MODEL["baseline"] == "drift"
+    assert TRAIN["input_length"] == input_length and MODEL["baseline"] is None
+    with pytest.raises(ValueError):
+        with override_params(not_a_param=1):
+            pass
+
+
+def test_get_candidates():
+    assert len(get_candidates(SPACE)) == 8
+    sampled = get_candidates(SPACE, n_candidates=3, seed=0)
+    assert len(sampled) == 3 and all(candidate in get_candidates(SPACE) for candidate in sampled)
+
+
+def test_successive_halving_finds_exact_baseline(data_monotonic_increase, tmp_path):
+    best, trials = successive_halving(data_monotonic_increase, SPACE, eta=2, cache_dir=str(tmp_path))
+    assert best["baseline"] == "drift"
+    # 8 candidates, then 4 on 2 folds, 2 on 4 folds, and the last one on full cross-validation
+    assert trials.groupby("rung").size().tolist() == [8, 4, 2, 1]
+    assert trials["max_folds"].tolist()[:8] == [1] * 8
+
+
+def test_successive_halving_reuses_cached_folds(data_monotonic_increase, tmp_path, monkeypatch):
+    best, trials = successive_halving(data_monotonic_increase, SPACE, eta=2, cache_dir=str(tmp_path))
+
+    def fit_model_should_not_be_called(*args, **kwargs):
+        raise AssertionError("folds already scored should not be trained again")
+    monkeypatch.setattr("ts_boilerplate.main.fit_model", fit_model_should_not_be_called)
+    best_again, trials_again = successive_halving(data_monotonic_increase, SPACE, eta=2, cache_dir=str(tmp_path))
+    assert best_again == best
+    pd.testing.assert_frame_equal(trials_again, trials)
+
+
+def test_successive_halving_in_parallel_matches_sequential(data_monotonic_increase):
+    best, trials = successive_halving(data_monotonic_increase, SPACE, eta=2, cache_dir=None)
+    best_parallel, trials_parallel = successive_halving(data_monotonic_increase, SPACE, eta=2, n_jobs=2, cache_dir=None)
+    assert best_parallel == best
+    pd.testing.assert_frame_equal(trials_parallel, trials)
+
+
+def test_successive_halving_in_parallel_overrides_params_in_workers(data_monotonic_increase, monkeypatch):
+    """Candidates differing only by an overridden param are scored with their own params by workers"""
+    monkeypatch.setitem(MODEL, "baseline", "moving_average")
+    space = dict(window=[1, 10])
+    _, trials = successive_halving(data_monotonic_increase, space, eta=2, cache_dir=None)
+    _, trials_parallel = successive_halving(data_monotonic_increase, space, eta=2, n_jobs=2, cache_dir=None)
+    scores = trials_parallel[trials_parallel["rung"] == 0].set_index("window")["score"]
+    assert scores[1] < scores[10]
+    pd.testing.assert_frame_equal(trials_parallel, trials)
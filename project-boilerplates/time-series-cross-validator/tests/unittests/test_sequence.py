@@ -0,0 +1,36 @@
+import pytest
+import numpy as np
+from ts_boilerplate.params import TRAIN
+from ts_boilerplate.dataprep import get_X_y
+from ts_boilerplate.sequence import WindowedSequence
+from ts_boilerplate.model import fit_model, get_model, predict_output
+
+
+def test_sequence_batches_match_get_X_y(data_monotonic_increase):
+    X, y = get_X_y(data_monotonic_increase, shuffle=False, **TRAIN)
+    seq = WindowedSequence(data_monotonic_increase, shuffle=False, batch_size=32, **TRAIN)
+    assert seq.n_samples == len(X)
+    assert len(seq) == int(np.ceil(len(X) / 32))
+    X_batch, y_batch = seq[1]
+    np.testing.assert_array_equal(X_batch, X[32:64])
+    np.testing.assert_array_equal(y_batch, y[32:64])
+    np.testing.assert_array_equal(seq.targets(), y)
+
+
+def test_shuffled_sequence_covers_every_window_once(data_monotonic_increase):
+    seq = WindowedSequence(data_monotonic_increase, seed=0, **TRAIN)
+    first_X = np.concatenate([seq[i][0][:, 0, 0] for i in range(len(seq))])
+    seq.on_epoch_end()
+    second_X = np.concatenate([seq[i][0][:, 0, 0] for i in range(len(seq))])
+    np.testing.assert_array_equal(np.sort(first_X), seq.starts)
+    np.testing.assert_array_equal(np.sort(second_X), seq.starts)
+    assert not np.array_equal(first_X, second_X)
+
+
+@pytest.mark.slow
+def test_model_can_fit_and_predict_a_sequence(data_monotonic_increase):
+    seq = WindowedSequence(data_monotonic_increase, **TRAIN)
+    model = get_model(*seq[0])
+    fit_model(model, seq, verbose=0)
+    y_pred = predict_output(model, WindowedSequence(data_monotonic_increase, shuffle=False, **TRAIN))
+    assert y_pred.shape == seq.targets().shape
@@ -0,0 +1,57 @@
+import pytest
+import numpy as np
+from ts_boilerplate.params import DATA, TRAIN
+from ts_boilerplate.dataprep import get_X_y
+from ts_boilerplate.windowing import NanIndex, get_window_starts, gather_windows
+
+
+@pytest.mark.parametrize("stride", [1, 3])
+def test_get_X_y_matches_loop_implementation(data_monotonic_increase, X_y_loop, stride):
+    params = {**TRAIN, "stride": stride}
+    X, y = get_X_y(data_monotonic_increase, shuffle=False, **params)
+    X_loop, y_loop = X_y_loop(data_monotonic_increase, **params)
+    assert X.shape == X_loop.shape and y.shape == y_loop.shape
+    np.testing.assert_array_equal(X, X_loop)
+    np.testing.assert_array_equal(y, y_loop)
+    assert len(get_window_starts(len(data_monotonic_increase), **params)) == len(X)
+
+
+def test_get_X_y_returns_read_only_views(data_monotonic_increase):
+    X, y = get_X_y(data_monotonic_increase, shuffle=False, **TRAIN)
+    assert np.shares_memory(X, data_monotonic_increase)
+    assert not X.flags.writeable and not y.flags.writeable
+
+    X_copy, _ = get_X_y(data_monotonic_increase, shuffle=False, copy=True, **TRAIN)
+    assert not np.shares_memory(X_copy, data_monotonic_increase)
+    assert X_copy.flags.c_contiguous and X_copy.flags.writeable
+
+
+def test_gather_windows_matches_get_X_y(data_monotonic_increase):
+    X, _ = get_X_y(data_monotonic_increase, shuffle=False, **TRAIN)
+    starts = np.array([5, 0, 42])
+    X_gathered, y_gathered = gather_windows(data_monotonic_increase, starts, **TRAIN)
+    np.testing.assert_array_equal(X_gathered, X[starts])
+    assert y_gathered.shape == (len(starts), TRAIN['output_length'], y_gathered.shape[2])
+
+
+def test_nan_index_counts_and_slices(data_monotonic_increase):
+    data = data_monotonic_increase.copy()
+    data[[10, 11, 300], 2] = np.nan
+    nan_index = NanIndex(data, chunk_size=64)
+    assert nan_index.count() == 3
+    assert nan_index.count(0, 10) == 0 and nan_index.count(10, 12) == 2
+    np.testing.assert_array_equal(nan_index.count(np.array([0, 11]), np.array([11, 301])), [1, 2])
+    assert len(nan_index[100:400]) == 300 and nan_index[100:400].count() == 1
+
+
+def test_get_X_y_dropna_only_drops_windows_containing_nans(data_monotonic_increase):
+    data = data_monotonic_increase.copy()
+    data[100, DATA['target_column_idx'][0]] = np.nan
+    data[300, DATA['n_targets']:] = np.nan  # Covariates only: y windows over timestep 300 remain valid
+    with pytest.raises(AssertionError):
+        get_X_y(data, shuffle=False, **TRAIN)
+    X, y = get_X_y(data, shuffle=False, dropna=True, **TRAIN)
+    X_full, _ = get_X_y(data_monotonic_increase, shuffle=False, **TRAIN)
+    assert not np.isnan(X).any() and not np.isnan(y).any()
+    # Windows whose X contain timestep 100 or 300 are dropped, and so are those whose y contain timestep 100
+    assert len(X) == len(X_full) - 2 * TRAIN['input_length'] - TRAIN['output_length']
@@ -0,0 +1,172 @@
+"""Baseline forecasters written in pure NumPy, usable in place of the keras model of `model.get_model`
+
+They follow the same `get_model` / `fit_model` / `predict_output` interface (see `model.py`), but never import
+TensorFlow: a whole backtest is scored in milliseconds, which makes them a cheap reference to compare
+any model against, even over thousands of series.
+
+Each baseline forecasts the targets of a window X of shape (n_samples, input_length, n_features) with its own rule:
+    - 'last_value': repeat the last target values
+    - 'seasonal_naive': repeat the target values of the last observed season
+    - 'moving_average': repeat the mean of the last `window` target values
+    - 'drift': extrapolate the line between the first and last target values of X
+    - 'linear_ar': linear regression of y on all values of X, fitted by least squares
+"""
+
+import numpy as np
+from ts_boilerplate.params import DATA, TRAIN
+from ts_boilerplate.sequence import WindowedSequence
+from typing import List, Tuple
+
+
+class BaselineModel:
+    """Common interface of NumPy baselines: `fit`, `partial_fit`, `predict`, `get_weights` and `set_weights`"""
+
+    def __init__(self, y_shape: Tuple[int, ...], **kwargs):
+        self.y_shape = tuple(y_shape)  # Shape of one y sample (as squeezed by get_X_y)
+        self.output_length = TRAIN['output_length']
+        self.horizon = TRAIN['horizon']
+
+    def __repr__(self) -> str:
+        params = {key: value for key, value in vars(self).items() if not key.startswith('_')}
+        return f"{type(self).__name__}({params})"
+
+    def _forecast(self, targets: np.ndarray) -> np.ndarray:
+        """Returns forecasts of shape (n_samples, output_length, n_targets) from the targets of X"""
+        raise NotImplementedError
+
+    def _repeat(self, values: np.ndarray) -> np.ndarray:
+        """Repeat `values` of shape (n_samples, n_targets) over the output length"""
+        return np.repeat(values[:, None, :], self.output_length, axis=1)
+
+    def fit(self, X, y=None, **kwargs):
+        """Most baselines have nothing to learn"""
+        return self
+
+    def partial_fit(self, X, y=None, **kwargs):
+        return self.fit(X, y, **kwargs)
+
+    def predict(self, X) -> np.ndarray:
+        """Returns y_pred of shape (n_samples, *y_shape), for an array X or all windows of a WindowedSequence"""
+        if isinstance(X, WindowedSequence):
+            batches = X.subset(slice(None), shuffle=False)
+            return np.concatenate([self.predict(batches[i][0]) for i in range(len(batches))])
+        X = np.asarray(X)
+        y_pred = self._forecast(X[:, :, DATA['target_column_idx']])
+        return y_pred.reshape(len(X), *self.y_shape)
+
+    def get_weights(self) -> List[np.ndarray]:
+        return []
+
+    def set_weights(self, weights: List[np.ndarray]):
+        pass
+
+
+class LastValue(BaselineModel):
+    def _forecast(self, targets):
+        return self._repeat(targets[:, -1])
+
+
+class SeasonalNaive(BaselineModel):
+    def __init__(self, y_shape, seasonality: int = 1, **kwargs):
+        super().__init__(y_shape)
+        assert 0 < seasonality <= TRAIN['input_length'], "seasonality should fit within input_length"
+        self.seasonality = seasonality
+
+    def _forecast(self, targets):
+        # The j-th output is `horizon + j` timesteps after the last input:
+        # repeat the latest input value sharing the same phase of the season
+        steps_ahead = self.horizon + np.arange(self.output_length)
+        idx = targets.shape[1] - 1 + steps_ahead - self.seasonality * np.ceil(steps_ahead / self.seasonality).astype(int)
+        return targets[:, idx]
+
+
+class MovingAverage(BaselineModel):
+    def __init__(self, y_shape, window: int = None, **kwargs):
+        super().__init__(y_shape)
+        self.window = TRAIN['input_length'] if window is None else window
+
+    def _forecast(self, targets):
+        return self._repeat(targets[:, -self.window:].mean(axis=1))
+
+
+class Drift(BaselineModel):
+    def _forecast(self, targets):
+        slope = (targets[:, -1] - targets[:, 0]) / max(targets.shape[1] - 1, 1)
+        steps_ahead = self.horizon + np.arange(self.output_length)
+        return targets[:, -1][:, None, :] + steps_ahead[None, :, None] * slope[:, None, :]
+
+
+class LinearAR(BaselineModel):
+    """Least squares regression of y on all values of X (plus an intercept), optionally ridge-regularized
+
+    The normal equations (XᵀX, Xᵀy) are accumulated batch after batch: fitting a WindowedSequence never
+    materializes all windows, and `partial_fit` keeps adding samples to the same sums
+    """
+
+    def __init__(self, y_shape, ridge: float = 0., **kwargs):
+        super().__init__(y_shape)
+        self.ridge = ridge
+        self._coef = None
+        self._XtX = None
+        self._Xty = None
+
+    @staticmethod
+    def _design(X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        return np.hstack([X, np.ones((len(X), 1))])
+
+    def _accumulate(self, X, y):
+        A = self._design(X)
+        b = np.asarray(y, dtype=np.float64).reshape(len(A), -1)
+        if self._XtX is None:
+            self._XtX = np.zeros((A.shape[1], A.shape[1]))
+            self._Xty = np.zeros((A.shape[1], b.shape[1]))
+        self._XtX += A.T @ A
+        self._Xty += A.T @ b
+
+    def _solve(self):
+        XtX = self._XtX + self.ridge * np.eye(len(self._XtX))
+        # lstsq rather than solve: collinear features (e.g. identical columns) are fine
+        self._coef = np.linalg.lstsq(XtX, self._Xty, rcond=None)[0]
+
+    def fit(self, X, y=None, **kwargs):
+        self._XtX = self._Xty = None
+        return self.partial_fit(X, y)
+
+    def partial_fit(self, X, y=None, **kwargs):
+        if isinstance(X, WindowedSequence):
+            for i in range(len(X)):
+                self._accumulate(*X[i])
+        else:
+            self._accumulate(X, y)
+        self._solve()
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        if isinstance(X, WindowedSequence):
+            return super().predict(X)
+        y_pred = self._design(X) @ self._coef
+        return y_pred.reshape(len(y_pred), *self.y_shape)
+
+    def get_weights(self) -> List[np.ndarray]:
+        return [] if self._coef is None else [self._coef]
+
+    def set_weights(self, weights: List[np.ndarray]):
+        if weights:
+            self._coef = weights[0]
+
+
+BASELINES = dict(
+    last_value=LastValue,
+    seasonal_naive=SeasonalNaive,
+    moving_average=MovingAverage,
+    drift=Drift,
+    linear_ar=LinearAR,
+)
+
+
+def get_baseline(name: str, X_train: np.ndarray, y_train: np.ndarray, **kwargs) -> BaselineModel:
+    """Instantiate the baseline called `name` (see `BASELINES`), for samples shaped like (X_train, y_train)"""
+    if name not in BASELINES:
+        raise ValueError(f"baseline should be one of {list(BASELINES)}, got {name}")
+    return BASELINES[name](np.shape(y_train)[1:], **kwargs)
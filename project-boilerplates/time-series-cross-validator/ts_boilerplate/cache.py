@@ -0,0 +1,116 @@
+"""Content-addressed on-disk cache for cross-validation folds, windows, fitted model weights and predictions
+
+Entries are keyed on a hash of everything they depend on (data, `TRAIN`/`CROSS_VAL`/`FIT` params, target columns, model config),
+so that re-running an identical experiment (e.g. only changing `print_metrics` or the metrics computed)
+skips training entirely. The least recently used entries are evicted once the cache exceeds `max_bytes`.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from typing import Dict, List, Optional
+
+
+def hash_array(data: np.ndarray, chunk_size: int = 1_000_000) -> str:
+    """Returns the SHA-256 hex digest of the shape, dtype and values of `data`, read block by block"""
+    sha = hashlib.sha256(f"{data.shape}{data.dtype}".encode())
+    for start in range(0, len(data), chunk_size):
+        sha.update(np.ascontiguousarray(data[start:start + chunk_size]).tobytes())
+    return sha.hexdigest()
+
+
+def model_config(model) -> str:
+    """Returns a serialized description of `model` architecture, loss and optimizer, to be used as part of cache keys
+    Keras auto-generated layer names (e.g. "dense_3") are left out, so that identical architectures
+    built twice in the same session share the same config. The optimizer config holds its current learning rate
+    """
+    if hasattr(model, "predict_batch"):
+        # A `pipeline.TsPipeline`, described by the keras model it wraps
+        return "TsPipeline" + model_config(model.model)
+    if not hasattr(model, "layers"):
+        return repr(model)
+    layers = []
+    for layer in model.layers:
+        config = {key: value for key, value in layer.get_config().items() if key != "name"}
+        layers.append([type(layer).__name__, config])
+    compile_config = model.get_compile_config() if getattr(model, "compiled", False) else None
+    optimizer = model.optimizer.get_config() if getattr(model, "optimizer", None) is not None else None
+    return json.dumps(dict(layers=layers, compile=compile_config, optimizer=optimizer), sort_keys=True, default=str)
+
+
+def weights_to_arrays(weights: List[np.ndarray]) -> Dict[str, np.ndarray]:
+    """Returns the `get_weights()` of a model as named arrays, to be stored in a FoldCache entry"""
+    return {f"weight_{i}": weight for i, weight in enumerate(weights)}
+
+
+def weights_from_arrays(arrays: Dict[str, np.ndarray]) -> List[np.ndarray]:
+    """Returns the weights stored by `weights_to_arrays` in a FoldCache entry, to be passed to `set_weights`"""
+    return [arrays[f"weight_{i}"] for i in range(sum(key.startswith("weight_") for key in arrays))]
+
+
+class FoldCache:
+    """On-disk cache of NumPy arrays, one directory per key in `cache_dir`"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2**30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Returns the content address of `parts` (JSON-serializable objects, e.g. hashes and param dicts)"""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """Returns the arrays stored under `key`, or None if there are none"""
+        path = os.path.join(self._entry_path(key), "arrays.npz")
+        if not os.path.isfile(path):
+            return None
+        # Mark the entry as recently used
+        os.utime(self._entry_path(key))
+        with np.load(path) as arrays:
+            return dict(arrays)
+
+    def save(self, key: str, **arrays: np.ndarray):
+        """Store `arrays` under `key`, then evict least recently used entries if the cache is too big"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Written to a temporary directory then renamed: concurrent workers never read half-written entries
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+        np.savez(os.path.join(tmp_dir, "arrays.npz"), **arrays)
+        try:
+            os.replace(tmp_dir, self._entry_path(key))
+        except OSError:
+            # Another process stored the same entry in the meantime
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def size(self) -> int:
+        """Returns the total size of the cache, in bytes"""
+        return sum(size for _, _, size in self._entries())
+
+    def _entries(self) -> List[tuple]:
+        """Returns (last access time, path, size in bytes) of every entry"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            entries.append((os.stat(path).st_mtime, path, size))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in `max_bytes`"""
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
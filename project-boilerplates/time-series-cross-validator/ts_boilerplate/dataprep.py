@@ -1,29 +1,156 @@
 """Prepare Data so as to be used in a Pipelined ML model"""
 
+import os
+import json
+import hashlib
 import numpy as np
-from ts_boilerplate.params import DATA
-from typing import Tuple, List
-import numpy as np
+from ts_boilerplate.params import DATA, DATA_RAW_CSV_PATH
+from ts_boilerplate.profiling import timed
+from ts_boilerplate.windowing import NanIndex, get_window_starts, get_windows
+from typing import Tuple, List, Union
 
 
-def load_data(data_path: str) -> np.ndarray:
+@timed("load_data")
+def load_data(data_path: str = DATA_RAW_CSV_PATH, mmap: bool = True) -> np.ndarray:
     """Load data from `data_path` into to memory
     Returns a 2D array with (axis 0) representing timesteps, and (axis 1) columns containing tagets and covariates
     ref: https://github.com/lewagon/data-images/blob/master/DL/time-series-covariates.png?raw=true
+
+    On first read, a CSV is converted into a binary `.npy` cache next to it. Later loads memory-map this cache
+    (read-only) if `mmap=True`, so that even multi-GB series open instantly and are read lazily from the page cache.
+    The cache is rebuilt whenever the SHA-256 checksum of the CSV changes.
+    All CSV columns should be numeric: a ValueError names those which are not.
     """
-    # YOUR_CODE_HERE
-    pass
+    if data_path.endswith('.npy'):
+        return np.load(data_path, mmap_mode='r' if mmap else None)
+
+    cache_path = os.path.splitext(data_path)[0] + '.npy'
+    meta_path = cache_path + '.json'
+    stat = os.stat(data_path)
+    meta = dict(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    cached_meta = {}
+    if os.path.isfile(cache_path) and os.path.isfile(meta_path):
+        with open(meta_path) as f:
+            cached_meta = json.load(f)
+
+    # Only hash the CSV if it may have changed since the cache was built
+    cache_is_valid = bool(cached_meta) and all(cached_meta.get(key) == value for key, value in meta.items())
+    if not cache_is_valid:
+        meta['sha256'] = _checksum(data_path)
+        cache_is_valid = cached_meta.get('sha256') == meta['sha256']
 
+    if not cache_is_valid:
+        import pandas as pd
+        df = pd.read_csv(data_path)
+        non_numeric = [column for column, dtype in df.dtypes.items() if not pd.api.types.is_numeric_dtype(dtype)]
+        if non_numeric:
+            raise ValueError(f"{data_path} has non-numeric columns {non_numeric}: drop them (e.g. a date column, "
+                             "implied by the order of rows) or encode them as numbers before loading")
+        data = df.to_numpy(dtype=float)
+        # Write to a temporary file first, so that an interrupted conversion never leaves a corrupted cache
+        tmp_path = cache_path + '.tmp.npy'
+        np.save(tmp_path, data)
+        os.replace(tmp_path, cache_path)
+    if not cache_is_valid or 'sha256' in meta:
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
 
-def clean_data(data: np.ndarray) -> np.ndarray:
+    return np.load(cache_path, mmap_mode='r' if mmap else None)
+
+
+def _checksum(path: str, chunk_size: int = 2**20) -> str:
+    """Returns the SHA-256 hex digest of the file at `path`, read by chunks"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@timed("clean_data")
+def clean_data(data: np.ndarray,
+               method: str = 'ffill',
+               out: Union[np.ndarray, str] = None,
+               chunk_size: int = 100_000,
+               return_report: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
     """Clean data without creating data leakage:
         - make sure there is no NaN between any timestep
         - etc...
+
+    NaNs are imputed in a single forward pass over blocks of `chunk_size` timesteps, carrying the last valid
+    value of each column from one block to the next. Memory is bounded by one block, so `data` can be a
+    memory-mapped array larger than RAM, written into `out` (an array, or the path of a `.npy` memmap to create).
+    - `method='ffill'` repeats the last valid value: no leak from the future
+    - `method='interpolate'` linearly interpolates between valid values, hence looks ahead up to the next valid one
+    Leading NaNs (before the first valid value of a column) have no past value to be filled with: back-filling them
+    would leak future values into the past, so leading timesteps are dropped until every column has a valid value.
+    The returned array is then a view of `out` starting at that timestep (dropped rows are left as NaNs in `out`).
+    A column without any valid value raises a ValueError.
+
+    Returns the cleaned data, and the number of imputed values per column (in the rows kept) if `return_report=True`
     """
-    # YOUR_CODE_HERE
-    pass
+    if method not in ('ffill', 'interpolate'):
+        raise ValueError(f"method should be 'ffill' or 'interpolate', got {method}")
+    if isinstance(out, str):
+        out = np.lib.format.open_memmap(out, mode='w+', dtype=data.dtype, shape=data.shape)
+    elif out is None:
+        out = np.empty_like(data)
+
+    n_columns = data.shape[1]
+    n_imputed = np.zeros(n_columns, dtype=np.int64)
+    # Carry-over state between blocks: last valid value (and its timestep) of each column
+    last_value = np.full(n_columns, np.nan)
+    last_idx = np.full(n_columns, -1)
+    # Timestep of the first valid value of each column
+    first_idx = np.full(n_columns, -1)
+
+    for start in range(0, len(data), chunk_size):
+        chunk = np.asarray(data[start:start + chunk_size])
+        stop = start + len(chunk)
+        is_nan = np.isnan(chunk)
+        n_imputed += is_nan.sum(axis=0)
+
+        # Forward-fill within the block, vectorized over columns, seeded with the carried values
+        rows = np.where(is_nan, -1, np.arange(len(chunk))[:, None])
+        rows = np.maximum.accumulate(rows, axis=0)
+        filled = np.where(rows >= 0, chunk[np.maximum(rows, 0), np.arange(n_columns)], last_value)
+        out[start:stop] = filled
+
+        has_valid = ~is_nan.all(axis=0)
+        # Columns with NaNs to fix in this block, or with a NaN gap left open by previous blocks
+        for col in np.flatnonzero(has_valid & (is_nan.any(axis=0) | (last_idx < start - 1))):
+            valid = np.flatnonzero(~is_nan[:, col]) + start
+            if last_idx[col] >= 0 and method == 'interpolate' and valid[0] > last_idx[col] + 1:
+                # A NaN gap, possibly opened in a previous block, is closed by this block
+                gap = np.arange(last_idx[col] + 1, valid[0])
+                out[gap, col] = np.interp(gap, [last_idx[col], valid[0]], [last_value[col], data[valid[0], col]])
+            if method == 'interpolate':
+                rows_to_interp = np.arange(valid[0], valid[-1] + 1)
+                out[rows_to_interp, col] = np.interp(rows_to_interp, valid, chunk[valid - start, col])
 
+        first_idx = np.where((first_idx < 0) & has_valid, start + np.argmax(~is_nan, axis=0), first_idx)
+        last_row = rows[-1]
+        last_idx = np.where(has_valid, start + last_row, last_idx)
+        last_value = np.where(has_valid, filled[-1], last_value)
 
+    if isinstance(out, np.memmap):
+        out.flush()
+    all_nan = np.flatnonzero(last_idx < 0) if len(data) else []
+    if len(all_nan):
+        raise ValueError(f"columns {all_nan.tolist()} only contain NaNs: there is no value to impute them from")
+
+    # Drop leading timesteps until every column has a valid value. Their NaNs are not imputed
+    n_leading = int(first_idx.max()) if n_columns and len(data) else 0
+    for start in range(0, n_leading, chunk_size):
+        n_imputed -= np.isnan(np.asarray(data[start:min(start + chunk_size, n_leading)])).sum(axis=0)
+    out = out[n_leading:]
+    if return_report:
+        return out, n_imputed
+    return out
+
+
+@timed("get_X_y")
 def get_X_y(
     data: np.ndarray,
     input_length: int,
@@ -31,6 +158,9 @@ def get_X_y(
     horizon: int,
     stride: int,
     shuffle=True,
+    copy=False,
+    nan_index: NanIndex = None,
+    dropna=False,
     **kwargs,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
@@ -54,33 +184,40 @@ def get_X_y(
         - `stride` timestamps after another
     Feel free to use another approach, for example random sampling without replacement
 
+    Unless `shuffle=True` or `copy=True`, X and y are read-only views on `data` (see `ts_boilerplate.windowing`)
+    A precomputed `nan_index` of `data` turns the NaN check into O(1). With `dropna=True`, only the (X, y) pairs
+    containing a NaN are dropped, instead of rejecting the whole dataset
     """
     # $CHALLENGIFY_BEGIN
-    assert np.isnan(data).sum() == 0
-
-    X = []
-    y = []
-
-    for i in range(0, len(data), stride):
-        Xi, yi = get_Xi_yi(first_index=i,
-                           data=data,
-                           horizon=horizon,
-                           input_length=input_length,
-                           output_length=output_length)
-        # Exit loop as soon as we reach the end of the dataset
-        if len(yi) < output_length:
-            break
-        X.append(Xi)
-        y.append(yi)
+    if nan_index is None and not dropna:
+        assert np.isnan(data).sum() == 0
+    elif not dropna:
+        assert nan_index.count() == 0
 
-    X = np.array(X)
-    y = np.array(y)
+    # Strided views: no timestep is duplicated, whatever the input_length
+    X, y = get_windows(data,
+                       input_length=input_length,
+                       output_length=output_length,
+                       horizon=horizon)
+    X = X[::stride]
+    y = y[::stride]
+    if dropna:
+        nan_index = NanIndex(data) if nan_index is None else nan_index
+        starts = get_window_starts(len(data), input_length, output_length, horizon, stride)
+        valid = nan_index.valid_windows(starts, input_length, output_length, horizon)
+        X = X[valid]
+        y = y[valid]
     y = np.squeeze(y)
+
     if shuffle:
+        # Fancy indexing copies the pairs into new contiguous arrays
         idx = np.arange(len(X))
         np.random.shuffle(idx)
         X = X[idx]
         y = y[idx]
+    elif copy:
+        X = np.ascontiguousarray(X)
+        y = np.ascontiguousarray(y)
 
     return X, y
     # $CHALLENGIFY_END
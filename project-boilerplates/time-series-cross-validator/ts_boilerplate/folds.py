@@ -0,0 +1,83 @@
+"""Cross-validation fold generators, yielding index ranges instead of arrays
+
+Each generator yields one `(train_slice, test_slice)` pair of `slice` objects per fold, to be applied to the
+whole series: `data[train_slice]` and `data[test_slice]` are views, so folds cost nothing to create.
+
+All of them keep the leak guarantee of `dataprep.train_test_split` (checked by `test_no_data_leak`): the first
+timestep of the first y_test is at least `horizon` timesteps after the last timestep of the last y_train.
+Like in `train_test_split`, the test slice starts `input_length` timesteps before the end of the train slice,
+so that the first X_test sees the last values of the training period (past inputs are not a leak).
+
+    - 'sliding': folds of fixed `fold_length`, every `fold_stride` timesteps (same folds as `dataprep.get_folds`)
+    - 'expanding': same test slices, but train slices are anchored at timestep 0 and grow fold after fold
+    - 'purged': sliding folds, whose train and test slices share no timestep at all (the test slice starts
+      right after the train slice), and are further separated by `embargo` timesteps
+"""
+
+import numpy as np
+from typing import Iterator, Tuple
+
+FOLD_METHODS = ('sliding', 'expanding', 'purged')
+
+
+def _split_fold(start: int, stop: int, train_test_ratio: float, input_length: int) -> Tuple[slice, slice]:
+    """Split fold `start:stop` into train and test slices, exactly like `dataprep.train_test_split`"""
+    last_train_idx = start + round(train_test_ratio * (stop - start))
+    return slice(start, last_train_idx), slice(last_train_idx - input_length, stop)
+
+
+def sliding_folds(n_timesteps: int,
+                  fold_length: int,
+                  fold_stride: int,
+                  train_test_ratio: float,
+                  input_length: int,
+                  **kwargs) -> Iterator[Tuple[slice, slice]]:
+    """Slide folds of `fold_length` every `fold_stride` timesteps, each split with `train_test_ratio`"""
+    for start in range(0, n_timesteps - fold_length + 1, fold_stride):
+        yield _split_fold(start, start + fold_length, train_test_ratio, input_length)
+
+
+def expanding_folds(n_timesteps: int,
+                    fold_length: int,
+                    fold_stride: int,
+                    train_test_ratio: float,
+                    input_length: int,
+                    **kwargs) -> Iterator[Tuple[slice, slice]]:
+    """Same test slices as `sliding_folds`, with train slices starting at timestep 0 (anchored walk-forward)"""
+    for train_slice, test_slice in sliding_folds(n_timesteps, fold_length, fold_stride, train_test_ratio, input_length):
+        yield slice(0, train_slice.stop), test_slice
+
+
+def purged_folds(n_timesteps: int,
+                 fold_length: int,
+                 fold_stride: int,
+                 train_test_ratio: float,
+                 input_length: int,
+                 embargo: int = 0,
+                 **kwargs) -> Iterator[Tuple[slice, slice]]:
+    """Sliding folds whose test slice starts `embargo` timesteps after the end of the train slice,
+    instead of `input_length` timesteps before it: no timestep is seen both during training and testing
+    """
+    for train_slice, test_slice in sliding_folds(n_timesteps, fold_length, fold_stride, train_test_ratio, input_length):
+        yield train_slice, slice(train_slice.stop + embargo, test_slice.stop)
+
+
+def generate_folds(n_timesteps: int, method: str = 'sliding', **kwargs) -> Iterator[Tuple[slice, slice]]:
+    """Yields the (train_slice, test_slice) of each fold of a series of `n_timesteps`, for the given `method`
+    `kwargs` are the `CROSS_VAL` and `TRAIN` params (see `params.py`)
+    """
+    if method not in FOLD_METHODS:
+        raise ValueError(f"method should be one of {FOLD_METHODS}, got {method}")
+    generator = dict(sliding=sliding_folds, expanding=expanding_folds, purged=purged_folds)[method]
+    return generator(n_timesteps, **kwargs)
+
+
+def folds_to_array(folds) -> np.ndarray:
+    """Returns the (train start, train stop, test start, test stop) of each fold, as a 2D int array"""
+    bounds = [(train.start, train.stop, test.start, test.stop) for train, test in folds]
+    return np.array(bounds, dtype=np.int64).reshape(-1, 4)
+
+
+def folds_from_array(bounds: np.ndarray) -> list:
+    """Inverse of `folds_to_array`"""
+    return [(slice(a, b), slice(c, d)) for a, b, c, d in np.asarray(bounds).tolist()]
@@ -1,10 +1,20 @@
+import os
+import json
+import hashlib
 import numpy as np
 from ts_boilerplate.params import CROSS_VAL, DATA, TRAIN
-from typing import Tuple
+from typing import Callable, Tuple
 
-def generate_data_monotonic_increase() -> np.ndarray:
+def _shape(length: int = None, n_features: int = None) -> Tuple[int, int]:
+    """Returns (length, n_features), defaulting to the sizes of `DATA`"""
+    length = DATA['length'] if length is None else length
+    n_features = DATA['n_covariates'] + DATA['n_targets'] if n_features is None else n_features
+    return length, n_features
+
+def generate_data_monotonic_increase(length: int = None, n_features: int = None, dtype=np.float64) -> np.ndarray:
     """Creates a monotonicly increasing time serie dataset for test purposes
-    - shape is (DATA['length'], DATA['n_covariates] + DATA['n_targets']),
+    - shape is (DATA['length'], DATA['n_covariates] + DATA['n_targets']), unless `length` or `n_features` are given
+    - dtype is float64, unless `dtype` is given (e.g. float32 to halve memory)
     - values are all equals to their respective integer index!
 
     e.g:
@@ -18,13 +28,14 @@ def generate_data_monotonic_increase() -> np.ndarray:
 
     """
 
-    indexes = np.arange(0, DATA['length'])
-    data = np.zeros((DATA['length'], DATA['n_covariates'] + DATA['n_targets'])) \
+    length, n_features = _shape(length, n_features)
+    indexes = np.arange(0, length, dtype=dtype)
+    data = np.zeros((length, n_features), dtype=dtype) \
         + np.expand_dims(indexes, axis=1)
     return data
 
-def generate_data_zeros_and_ones() -> np.ndarray:
-    """Create a dummy data made of zeros for covariates, and ones for the targets
+def generate_data_zeros_and_ones(length: int = None, n_features: int = None, dtype=np.float64) -> np.ndarray:
+    """Create a dummy data made of zeros for covariates, and ones for the targets (same sizes and dtype as above)
     e.g:
     data = array(
       [[1.,1.,0.,0.,0.],
@@ -34,11 +45,54 @@ def generate_data_zeros_and_ones() -> np.ndarray:
        [1.,1.,0.,0.,0.]]
     )
     """
-    shape = (DATA['length'], DATA['n_covariates'] + DATA['n_targets'])
-    data = np.zeros(shape)
+    data = np.zeros(_shape(length, n_features), dtype=dtype)
     data[:, DATA["target_column_idx"]] = 1.
     return data
 
+def generate_data_seasonal(length: int = None,
+                           n_features: int = None,
+                           seasonality: int = 24,
+                           trend: float = 0.01,
+                           noise: float = 0.1,
+                           dtype=np.float64,
+                           seed: int = None) -> np.ndarray:
+    """Creates a realistic multivariate time serie: level + linear trend + seasonality + gaussian noise
+    - sizes and dtype as in `generate_data_monotonic_increase`
+    - each column gets its own random level, slope (up to `trend` per timestep), seasonal amplitude and phase
+      (period `seasonality` timesteps), and noise of std `noise`
+    - the same `seed` always generates the same series
+
+    Built by broadcasting (no Python loop over timesteps), directly in `dtype`
+    """
+    length, n_features = _shape(length, n_features)
+    rng = np.random.default_rng(seed)
+    level = rng.uniform(1, 10, size=n_features).astype(dtype)
+    slope = rng.uniform(-trend, trend, size=n_features).astype(dtype)
+    amplitude = rng.uniform(0.5, 2, size=n_features).astype(dtype)
+    phase = rng.uniform(0, 2 * np.pi, size=n_features).astype(dtype)
+
+    t = np.arange(length, dtype=dtype)[:, None]
+    data = rng.standard_normal((length, n_features), dtype=dtype)
+    data *= noise
+    data += level + slope * t
+    data += amplitude * np.sin((2 * np.pi / seasonality) * t + phase)
+    return data
+
+def load_or_generate(cache_dir: str, generator: Callable, **kwargs) -> np.ndarray:
+    """Returns `generator(**kwargs)` as a read-only memory-mapped array, cached as a `.npy` file in `cache_dir`
+    The file is named after the generator and its arguments: later calls (e.g. in later test sessions) only map it
+    """
+    arguments = json.dumps(kwargs, sort_keys=True, default=lambda value: np.dtype(value).name)
+    key = hashlib.sha256(f"{generator.__name__}{arguments}".encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"{generator.__name__}-{key}.npy")
+    if not os.path.isfile(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first, so that an interrupted session never leaves a corrupted fixture
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, generator(**kwargs))
+        os.replace(tmp_path, path)
+    return np.load(path, mmap_mode='r')
+
 def generate_X_y_zeros_and_ones() -> Tuple[np.ndarray]:
     """Create a dummy (X,y) tuple made of zeros for covariates, and ones for the targets, just to check if model fit well"""
     length = round(DATA["length"] / TRAIN['stride'])
@@ -0,0 +1,87 @@
+"""Warm-start training for backtests: one model is kept across backtest steps
+
+At each step, the model is only fine-tuned on the windows newly revealed since the previous step,
+plus a replay buffer of older windows sampled at random (to avoid forgetting the past).
+The cost of a step is therefore independent of how far we are in the backtest.
+"""
+
+import numpy as np
+from ts_boilerplate.model import fine_tune_model, fit_model, get_model
+from ts_boilerplate.profiling import count
+from ts_boilerplate.sequence import WindowedSequence, squeeze_samples
+from ts_boilerplate.windowing import NanIndex, gather_windows, get_window_length
+
+
+class IncrementalTrainer:
+    """Reveal `data` one backtest step after another, and keep a single model up-to-date with it
+
+    Revealed windows are the (Xi, yi) pairs fully contained in `data[:end_timestep]`, sampled with `stride`.
+    As they always start at 0, stride, 2*stride, ..., they are tracked by their count only.
+    """
+
+    def __init__(self,
+                 data: np.ndarray,
+                 input_length: int,
+                 output_length: int,
+                 horizon: int,
+                 stride: int,
+                 replay_size: int = 256,
+                 seed: int = None,
+                 nan_index: NanIndex = None,
+                 **kwargs):
+        self.data = data
+        self.nan_index = nan_index
+        self.window_params = dict(input_length=input_length,
+                                  output_length=output_length,
+                                  horizon=horizon,
+                                  stride=stride)
+        self.replay_size = replay_size
+        self.model = None
+        self.n_windows = 0
+        self.end_timestep = 0
+        self._rng = np.random.default_rng(seed)
+
+    def reveal(self, end_timestep: int) -> np.ndarray:
+        """Extend revealed windows up to `data[:end_timestep]`.
+        Returns the positions of the newly revealed windows (window `k` starts at timestep `k * stride`)
+        """
+        # Only the newly revealed timesteps need to be checked
+        if self.nan_index is None:
+            assert np.isnan(self.data[self.end_timestep:end_timestep]).sum() == 0
+        else:
+            assert self.nan_index.count(self.end_timestep, max(end_timestep, self.end_timestep)) == 0
+        self.end_timestep = max(end_timestep, self.end_timestep)
+
+        window_length = get_window_length(**self.window_params)
+        stride = self.window_params['stride']
+        n_windows = max(0, (self.end_timestep - window_length) // stride + 1)
+        new_positions = np.arange(self.n_windows, n_windows)
+        self.n_windows = n_windows
+        return new_positions
+
+    def update(self, end_timestep: int, fit: bool = True):
+        """Reveal `data[:end_timestep]` and returns the model, fine-tuned on new windows if `fit` is True.
+        The first call instantiates the model, and fully fits it on all windows revealed so far
+        """
+        new_positions = self.reveal(end_timestep)
+        stride = self.window_params['stride']
+
+        if self.model is None:
+            seq = WindowedSequence(self.data[:self.end_timestep],
+                                   starts=new_positions * stride,
+                                   check_nan=False,
+                                   **self.window_params)
+            self.model = get_model(*seq[0], pipeline=True)
+            if fit:
+                fit_model(self.model, seq)
+            return self.model
+
+        if fit and len(new_positions) > 0:
+            n_old = new_positions[0]
+            # Replay older windows sampled with replacement: O(replay_size), whatever the number of old windows
+            replay_positions = self._rng.integers(0, n_old, size=min(self.replay_size, n_old))
+            positions = np.concatenate([new_positions, replay_positions])
+            X, y = gather_windows(self.data, positions * stride, **self.window_params)
+            count("incremental_windows", len(positions))
+            fine_tune_model(self.model, X, squeeze_samples(y))
+        return self.model
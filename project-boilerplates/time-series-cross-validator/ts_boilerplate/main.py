@@ -2,70 +2,193 @@
 Top level orchestrator of the project. To be called from the CLI.
 It comprises all the "routes" you may want to call
 '''
-from email import header
 import numpy as np
-import pandas as pd
 import os
-from ts_boilerplate.dataprep import get_Xi_yi, get_X_y, get_folds, train_test_split
+import time
+from ts_boilerplate.dataprep import load_data, get_X_y, train_test_split
+from ts_boilerplate.sequence import WindowedSequence
+from ts_boilerplate.windowing import NanIndex, gather_windows, get_window_starts
 from ts_boilerplate.model import get_model, fit_model, predict_output
-from ts_boilerplate.metrics import mape, mae
-from ts_boilerplate.params import CROSS_VAL, ROOT_DIR, TRAIN, DATA
+from ts_boilerplate.incremental import IncrementalTrainer
+from ts_boilerplate.cache import FoldCache, hash_array, model_config, weights_from_arrays, weights_to_arrays
+from ts_boilerplate.folds import folds_from_array, folds_to_array, generate_folds
+from ts_boilerplate.parallel import get_n_jobs, train_folds_in_parallel
+from ts_boilerplate.profiling import count, timed, timer
+from ts_boilerplate.metrics import mape, mae, StreamingMAE
+from ts_boilerplate.params import CROSS_VAL, DATA_RAW_CSV_PATH, FIT, ROOT_DIR, TRAIN, DATA
 from typing import Tuple, List
-import matplotlib.pyplot as plt
 
 
-def train(data: np.ndarray, print_metrics: bool = False):
+def _model_key(cache: FoldCache, windows_key: str, model) -> str:
+    """Cache key of a model fitted on the training windows of `windows_key`: everything its weights and predictions
+    depend on (windows, model, training loop and target columns)
+    """
+    return cache.key("model", windows_key, model_config(model), FIT, DATA['target_column_idx'])
+
+
+@timed("train")
+def train(data: np.ndarray,
+          print_metrics: bool = False,
+          nan_index: NanIndex = None,
+          dropna: bool = False,
+          cache: FoldCache = None,
+          data_hash: str = None,
+          fold: Tuple[slice, slice] = None):
     """
     Train the model in this package on one fold `data` containing the 2D-array of time-series for your problem
     Returns `metrics_test` associated with the training
+    - `nan_index`: NanIndex of `data`, if already computed (e.g. sliced from the index of the whole dataset)
+    - `dropna=True` drops the (X, y) pairs containing NaNs, instead of rejecting the whole fold
+    - `cache`: FoldCache memoizing window indexes, fitted weights and predictions of identical runs.
+      `data_hash` identifies `data` in this cache (computed if not given)
+    - `fold`: (train_slice, test_slice) of `data` (see `folds.py`). By default, `data` is split by `train_test_split`
     """
     # $CHALLENGIFY_BEGIN
-    data_train, data_test = train_test_split(data, **TRAIN)
-    X_train, y_train = get_X_y(data_train, **TRAIN)
-    X_test, y_test = get_X_y(data_test, **TRAIN)
-    model = get_model(X_train, y_train)
-    history = fit_model(model, X_train, y_train)
-    y_pred = predict_output(model, X_test)
-    metrics_test = mae(y_test, y_pred)
+    if fold is None:
+        data_train, data_test = train_test_split(data, **TRAIN)
+        fold = (slice(0, len(data_train)), slice(len(data) - len(data_test), len(data)))
+    train_slice, test_slice = fold
+    data_train, data_test = data[train_slice], data[test_slice]
+    with timer("windowing"):
+        if cache is not None:
+            data_hash = hash_array(data) if data_hash is None else data_hash
+            fold_bounds = folds_to_array([fold]).tolist()
+            windows_key = cache.key("windows", data_hash, fold_bounds, TRAIN, dropna)
+            windows = cache.load(windows_key)
+        if cache is not None and windows is not None:
+            train_seq = WindowedSequence(data_train, starts=windows["train_starts"], check_nan=False, **TRAIN)
+            test_seq = WindowedSequence(data_test, starts=windows["test_starts"], check_nan=False, shuffle=False, **TRAIN)
+        else:
+            # Lazy sequences of windows: (X, y) mini-batches are gathered on the fly
+            train_seq = WindowedSequence(data_train,
+                                         nan_index=NanIndex(data_train) if nan_index is None else nan_index[train_slice],
+                                         dropna=dropna,
+                                         **TRAIN)
+            test_seq = WindowedSequence(data_test,
+                                        shuffle=False,
+                                        nan_index=NanIndex(data_test) if nan_index is None else nan_index[test_slice],
+                                        dropna=dropna,
+                                        **TRAIN)
+            if cache is not None:
+                cache.save(windows_key, train_starts=train_seq.starts, test_starts=test_seq.starts)
+    count("windows", train_seq.n_samples + test_seq.n_samples)
+
+    model = get_model(*train_seq[0], pipeline=True)
+    if cache is not None:
+        model_key = _model_key(cache, windows_key, model)
+        fitted = cache.load(model_key)
+    if cache is not None and fitted is not None:
+        # Identical data, params and model: skip training entirely
+        y_pred = fitted["y_pred"]
+    else:
+        history = fit_model(model, train_seq)
+        y_pred = predict_output(model, test_seq)
+        if cache is not None:
+            cache.save(model_key, y_pred=y_pred, **weights_to_arrays(model.get_weights()))
+    with timer("metrics"):
+        metrics_test = mae(test_seq.targets(), y_pred)
     if print_metrics:
         print("### Test Metric: ", metrics_test)
     return metrics_test
     # $CHALLENGIFY_END
 
 
-def cross_validate(data: np.ndarray, print_metrics: bool = False):
+@timed("cross_validate")
+def cross_validate(data: np.ndarray,
+                   print_metrics: bool = False,
+                   n_jobs: int = 1,
+                   return_fold_times: bool = False,
+                   cache_dir: str = None,
+                   max_folds: int = None):
     """
     Cross-Validate the model in this package on`data`
     Returns `metrics_cv`: the list of test metrics at each fold
+    - `n_jobs` > 1 trains folds in parallel processes (-1 to use all CPU cores)
+    - `return_fold_times=True` returns a tuple (metrics_cv, fold_times) with the wall time (s) of each fold
+    - `cache_dir` (e.g. params.CACHE_DIR) memoizes folds, windows, fitted weights and predictions on disk, so that
+      re-running identical folds skips training
+    - `max_folds` only runs the first `max_folds` folds (e.g. cheap early rungs of `search.successive_halving`)
+    Folds are generated by `folds.generate_folds`, with the method ('sliding', 'expanding' or 'purged') of `CROSS_VAL`
     """
     # $CHALLENGIFY_BEGIN
-    folds = get_folds(data, **CROSS_VAL)
-    metrics_cv = []
-    for fold in folds:
-        metrics_fold = train(fold, print_metrics=print_metrics)
-        metrics_cv.append(metrics_fold)
+    data_hash = None
+    if cache_dir is not None:
+        cache = FoldCache(cache_dir)
+        data_hash = hash_array(data)
+        folds_key = cache.key("folds", data_hash, CROSS_VAL, TRAIN)
+        cached_folds = cache.load(folds_key)
+        if cached_folds is None:
+            folds = list(generate_folds(len(data), **CROSS_VAL, **TRAIN))
+            cache.save(folds_key, bounds=folds_to_array(folds))
+        else:
+            folds = folds_from_array(cached_folds["bounds"])
+    else:
+        cache = None
+        # Folds are (train_slice, test_slice) index ranges: no fold array is ever copied
+        folds = list(generate_folds(len(data), **CROSS_VAL, **TRAIN))
+    folds = folds[:max_folds]
+
+    if get_n_jobs(n_jobs) == 1:
+        # The NaN index is built once: checking each fold is then O(1)
+        nan_index = NanIndex(data)
+        metrics_cv = []
+        fold_times = []
+        for fold in folds:
+            tic = time.perf_counter()
+            metrics_fold = train(data,
+                                 print_metrics=print_metrics,
+                                 nan_index=nan_index,
+                                 cache=cache,
+                                 data_hash=data_hash,
+                                 fold=fold)
+            fold_times.append(time.perf_counter() - tic)
+            metrics_cv.append(metrics_fold)
+    else:
+        metrics_cv, fold_times = train_folds_in_parallel(data,
+                                                         folds,
+                                                         n_jobs=n_jobs,
+                                                         print_metrics=print_metrics,
+                                                         cache_dir=cache_dir,
+                                                         data_hash=data_hash)
 
     if print_metrics:
         print(f"### CV metrics after {len(folds)} folds ### ")
         print(metrics_cv)
+        print(f"### Fold wall times (s): {np.round(fold_times, 2).tolist()}")
+    if return_fold_times:
+        return metrics_cv, fold_times
     return metrics_cv
     # $CHALLENGIFY_END
 
 
+@timed("backtest")
 def backtest(data: np.ndarray,
              stride: int = 1,
              start_ratio: float = 0.9,
              retrain: bool = True,
              retrain_every: int = 1,
+             incremental: bool = False,
+             replay_size: int = 256,
+             cache_dir: str = None,
              print_metrics=False,
              plot_metrics=False):
     """Returns historical forecasts for the entire dataset
-    - by training model up to `start_ratio` of the dataset
+    - by training model up to `start_ratio` of the dataset (also when `retrain` is False)
     - then predicting next values using the model in this package (only predict the last time-steps if `predict_only_last_value` is True)
     - then moving `stride` timesteps ahead
     - then retraining the model if `retrain` is True and if we moved `retrain_every` timesteps since last training
     - then predicting next values again
 
+    All steps between two retrains share the same model weights: they are predicted in one single batch.
+
+    If `incremental` is True, a single model is kept across steps (warm-start): each retrain only fine-tunes it
+    on the windows revealed since the previous step, plus `replay_size` older windows sampled at random.
+    The cost of each step then no longer grows with the length of the training set.
+
+    `cache_dir` (e.g. params.CACHE_DIR) stores the weights fitted at each retrain in a `cache.FoldCache`: re-running
+    an identical backtest reloads them instead of training again (incremental backtests are never cached, since
+    their weights depend on all previous steps)
+
     Return:
     - all historical predictions as 2D-array time-series of shape ((1-start_ratio)*len(data), n_targets)/stride
     - Compute the 'mean-MAPE' per forecast horizon
@@ -77,48 +200,80 @@ def backtest(data: np.ndarray,
 
     # Initialization
     start_timestep_0 = round(start_ratio * len(data))
-    data_train_0 = data[:start_timestep_0, ...]
-    X_train_tmp, y_train_tmp = get_X_y(data_train_0, **TRAIN)
     data_test_backtested = data[start_timestep_0:, ...]
-    _, y_test = get_X_y(data_test_backtested, **TRAIN, shuffle=False)
-    y_pred_backtested = []
-    retrain_counter = 0
-    timesteps_backtested_list = []
-    for i in range(0, len(data_test_backtested), stride):
-        start_timestep_i = start_timestep_0 + i
-        data_train = data[:start_timestep_i, ...]
-        data_test = data[start_timestep_i:, ...]
-        X_train_tmp, y_train_tmp = get_X_y(data_train, **TRAIN)
-        X_test_i, y_test_i = get_Xi_yi(first_index=0, data=data_test, **TRAIN)
-
-        # At some point after sliding through time, we will reach the end of the test set
-        if y_test_i.shape[0] < y_train_tmp.shape[1]:
-            break
-
-        model = get_model(X_train_tmp, y_train_tmp)
+    # The NaN index is built once: checking the growing training set at each step is then O(1)
+    nan_index = NanIndex(data)
+    _, y_test = get_X_y(data_test_backtested, **TRAIN, shuffle=False, nan_index=nan_index[start_timestep_0:])
+    # Backtest steps whose test window (Xi, yi) still fits before the end of the dataset
+    n_test_windows = len(get_window_starts(len(data_test_backtested),
+                                           TRAIN['input_length'],
+                                           TRAIN['output_length'],
+                                           TRAIN['horizon']))
+    timesteps_backtested_list = list(range(0, n_test_windows, stride))
 
-        # Retrain when required, with incremental learning (ie. starting from previous weights)
-        if retrain and i % retrain_every == 0:
-            retrain_counter += 1
-            fit_model(model, X_train_tmp, y_train_tmp)
+    # Group consecutive steps sharing the same model weights, ie. a new group at each retrain
+    steps_per_model = []
+    for i in timesteps_backtested_list:
+        if not steps_per_model or (retrain and i % retrain_every == 0):
+            steps_per_model.append([])
+        steps_per_model[-1].append(i)
 
-        y_pred_i = np.squeeze(predict_output(model, X_test_i[None, ...]))
-        y_pred_backtested.append(y_pred_i)
-        timesteps_backtested_list.append(i)
+    # Predictions are scored as they are produced: only kept in memory if they need to be plotted
+    metrics_accumulator = StreamingMAE()
+    y_pred_backtested = []
+    retrain_counter = 0
+    trainer = IncrementalTrainer(data, replay_size=replay_size, nan_index=nan_index, **TRAIN) if incremental else None
+    model = None
+    cache = FoldCache(cache_dir) if cache_dir is not None and not incremental else None
+    data_hash = hash_array(data) if cache is not None else None
+    for steps in steps_per_model:
+        start_timestep_i = start_timestep_0 + steps[0]
+        # The model is always trained on the first step
+        retrain_i = model is None or (retrain and steps[0] % retrain_every == 0)
+        retrain_counter += retrain_i
+        if incremental:
+            # Warm-start: fine-tune the same model on newly revealed windows only
+            model = trainer.update(start_timestep_i, fit=retrain_i)
+        else:
+            train_seq = WindowedSequence(data[:start_timestep_i, ...], nan_index=nan_index[:start_timestep_i], **TRAIN)
+            # A single pipeline is refitted from scratch at each retrain: its compiled predict is traced once
+            model = get_model(*train_seq[0], pipeline=True) if model is None else model
+            if cache is not None:
+                windows_key = cache.key("backtest_windows", data_hash, start_timestep_i, TRAIN)
+                model_key = _model_key(cache, windows_key, model)
+                fitted = cache.load(model_key)
+            if cache is not None and fitted is not None:
+                model.set_weights(weights_from_arrays(fitted))
+            else:
+                fit_model(model, train_seq)
+                if cache is not None:
+                    cache.save(model_key, **weights_to_arrays(model.get_weights()))
 
-    y_pred_backtested = np.array(y_pred_backtested)
-    y_test_backtested = y_test[timesteps_backtested_list]
-    # Check that we compare apples to apples
-    assert y_pred_backtested.shape == y_test_backtested.shape
+        # One batched predict over all the test windows of these steps, instead of one predict per step
+        X_test_steps, _ = gather_windows(data, start_timestep_0 + np.array(steps), **TRAIN)
+        y_pred_steps = predict_output(model, X_test_steps)
+        count("backtest_steps", len(steps))
+        y_test_steps = y_test[steps]
+        # Check that we compare apples to apples
+        assert y_pred_steps.shape == y_test_steps.shape
+        metrics_accumulator.update(y_test_steps, y_pred_steps)
+        if plot_metrics:
+            y_pred_backtested.append(y_pred_steps)
 
-    metrics_backtested = mae(y_pred_backtested, y_test_backtested)
+    metrics_backtested = metrics_accumulator.finalize()
 
     if print_metrics:
         print(
-            f'### BACKETESTED METRICS BASED ON THE LAST {y_pred_backtested.shape[0]} TIMESTEPS AND WITH {retrain_counter} retrain operations'
+            f'### BACKETESTED METRICS BASED ON THE LAST {metrics_accumulator.n_samples} TIMESTEPS AND WITH {retrain_counter} retrain operations'
         )
-        print(mae(y_pred_backtested, y_test_backtested))
+        print(metrics_backtested)
+        print("### MAE per forecast horizon: ", metrics_accumulator.finalize(breakdown="horizon"))
     if plot_metrics:
+        # Only loaded when a plot is requested
+        import matplotlib.pyplot as plt
+
+        y_pred_backtested = np.concatenate(y_pred_backtested)
+        y_test_backtested = y_test[timesteps_backtested_list]
         # TODO: make it work for any dimension of y
         plt.plot(y_pred_backtested[:,0,0], label='historical forecasts')
         plt.plot(y_test_backtested[:,0,0], label='truth')
@@ -130,7 +285,7 @@ def backtest(data: np.ndarray,
     # $CHALLENGIFY_END
 
 if __name__ == '__main__':
-    data = pd.read_csv(os.path.join(ROOT_DIR, 'data','raw','data.csv')).to_numpy()
+    data = load_data(DATA_RAW_CSV_PATH)
     try:
         train(data=data, print_metrics=True)
         cross_validate(data=data, print_metrics=True)
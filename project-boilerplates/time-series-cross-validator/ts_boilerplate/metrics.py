@@ -1,40 +1,182 @@
 '''
 Computes usefull Time Series metrics from (y_true, y_test)
+
+Metrics are pure NumPy (no TensorFlow round-trip). They accept y in any of the shapes returned by `get_X_y`,
+and can break errors down per forecast horizon (`breakdown="horizon"`) or per target (`breakdown="target"`).
+Streaming accumulators (`StreamingMAE`, `StreamingMAPE`, `StreamingMASE`) score batches as they come.
 '''
 
 import numpy as np
-from tensorflow import reduce_mean
-from tensorflow.keras.metrics import mean_absolute_error, mean_absolute_percentage_error
+from ts_boilerplate.params import DATA, TRAIN
+from typing import Union
+
+EPSILON = 1e-7  # Same as keras backend epsilon, to avoid dividing by zero in MAPE
+
+
+def _to_3D(y: np.ndarray) -> np.ndarray:
+    """Reshape y from any `get_X_y` squeezed shape back to (n_samples, output_length, n_targets)"""
+    return np.asarray(y).reshape(-1, TRAIN['output_length'], DATA['n_targets'])
+
 
+def _reduce(errors: np.ndarray, breakdown: str = None) -> Union[float, np.ndarray]:
+    """Average `errors` over all axes, or over all axes but the horizon/target one if `breakdown` is set"""
+    if breakdown is None:
+        return float(np.mean(errors))
+    errors = _to_3D(errors)
+    if breakdown == "horizon":
+        return errors.mean(axis=(0, 2))
+    if breakdown == "target":
+        return errors.mean(axis=(0, 1))
+    raise ValueError(f"breakdown should be None, 'horizon' or 'target', got {breakdown}")
 
-def mae(y_true: np.ndarray, y_pred: np.ndarray) -> float:
+
+def _naive_errors(y: np.ndarray, seasonality: int) -> np.ndarray:
+    """Absolute errors of the seasonal naive forecast y[t] = y[t - seasonality], along the sample axis"""
+    y = _to_3D(y)
+    return np.abs(y[seasonality:] - y[:-seasonality])
+
+
+def mae(y_true: np.ndarray, y_pred: np.ndarray, breakdown: str = None) -> Union[float, np.ndarray]:
     """Returns Mean Absolute Error"""
     # $CHALLENGIFY_BEGIN
-    return reduce_mean(mean_absolute_error(y_true, y_pred)).numpy()
+    return _reduce(np.abs(np.asarray(y_true) - np.asarray(y_pred)), breakdown)
     # $CHALLENGIFY_END
 
-def mape(y_true: np.ndarray, y_pred: np.ndarray) -> float:
+def mape(y_true: np.ndarray, y_pred: np.ndarray, breakdown: str = None) -> Union[float, np.ndarray]:
     """Returns Mean Absolute Percentage Error"""
     # $CHALLENGIFY_BEGIN
-    return reduce_mean(mean_absolute_percentage_error(y_true, y_pred)).numpy()
+    y_true = np.asarray(y_true)
+    errors = 100. * np.abs(y_true - np.asarray(y_pred)) / np.maximum(np.abs(y_true), EPSILON)
+    return _reduce(errors, breakdown)
     # $CHALLENGIFY_END
 
-def mase(y_true: np.ndarray, y_pred: np.ndarray) -> float:
+def mase(y_true: np.ndarray,
+         y_pred: np.ndarray,
+         y_train: np.ndarray = None,
+         seasonality: int = 1,
+         breakdown: str = None) -> Union[float, np.ndarray]:
     """Returns Mean Absolute Scaled Error (https://en.wikipedia.org/wiki/Mean_absolute_scaled_error)
+    Errors are scaled per target by the MAE of the seasonal naive forecast on `y_train` (defaults to `y_true`),
+    whose axis 0 must be chronological
+    """
+    scale = _naive_errors(y_true if y_train is None else y_train, seasonality).mean(axis=(0, 1))
+    errors = _to_3D(np.abs(np.asarray(y_true) - np.asarray(y_pred))) / np.maximum(scale, EPSILON)
+    return _reduce(errors, breakdown)
+
+
+class StreamingMAE:
+    """Mean Absolute Error accumulated batch after batch: `update(y_true, y_pred)` then `finalize()`
+    Only running sums of shape (output_length, n_targets) are kept in memory
+    """
+
+    def __init__(self):
+        self.n_samples = 0
+        self._sums = np.zeros((TRAIN['output_length'], DATA['n_targets']))
+
+    def _errors(self, y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
+        return np.abs(np.asarray(y_true) - np.asarray(y_pred))
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray):
+        """Accumulate a batch of (y_true, y_pred) pairs"""
+        errors = _to_3D(self._errors(y_true, y_pred))
+        self.n_samples += len(errors)
+        self._sums += errors.sum(axis=0)
+
+    def finalize(self, breakdown: str = None) -> Union[float, np.ndarray]:
+        """Returns the metric over all pairs seen so far"""
+        means = self._sums / max(self.n_samples, 1)
+        return _reduce(means[None, ...], breakdown)
+
+
+class StreamingMAPE(StreamingMAE):
+    """Mean Absolute Percentage Error accumulated batch after batch"""
+
+    def _errors(self, y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
+        y_true = np.asarray(y_true)
+        return 100. * np.abs(y_true - np.asarray(y_pred)) / np.maximum(np.abs(y_true), EPSILON)
+
+
+class StreamingMASE(StreamingMAE):
+    """Mean Absolute Scaled Error accumulated batch after batch, in chronological order
+    The naive-forecast scale is accumulated along the way, carrying the last `seasonality` samples between batches
+    """
+
+    def __init__(self, seasonality: int = 1):
+        super().__init__()
+        self.seasonality = seasonality
+        self._n_naive = 0
+        self._naive_sums = np.zeros(DATA['n_targets'])
+        self._last_y_true = np.empty((0, TRAIN['output_length'], DATA['n_targets']))
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray):
+        super().update(y_true, y_pred)
+        y_true = np.concatenate([self._last_y_true, _to_3D(y_true)])
+        naive_errors = _naive_errors(y_true, self.seasonality)
+        self._n_naive += naive_errors.shape[0] * naive_errors.shape[1]
+        self._naive_sums += naive_errors.sum(axis=(0, 1))
+        self._last_y_true = y_true[-self.seasonality:]
+
+    def finalize(self, breakdown: str = None) -> Union[float, np.ndarray]:
+        scale = self._naive_sums / max(self._n_naive, 1)
+        means = self._sums / max(self.n_samples, 1) / np.maximum(scale, EPSILON)
+        return _reduce(means[None, ...], breakdown)
+
+
+def mase_per_series(y_true: np.ndarray, y_pred: np.ndarray, seasonality: int = 1) -> np.ndarray:
+    """Returns the MASE of each series of a batch, vectorized over all of them
+    y_true.shape = (..., timesteps) and y_pred.shape = (..., timesteps) or (..., timesteps, horizons)
+    Each series is scaled by the MAE of its own seasonal naive forecast.
+    Returns an array of shape (...) or (..., horizons)
     """
-    pass
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    scale = np.maximum(np.abs(y_true[..., seasonality:] - y_true[..., :-seasonality]).mean(axis=-1), EPSILON)
+    if y_pred.ndim == y_true.ndim + 1:
+        return np.abs(y_true[..., None] - y_pred).mean(axis=-2) / scale[..., None]
+    return np.abs(y_true - y_pred).mean(axis=-1) / scale
 
 
-def play_trading_strategy(y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
-    """Returns the array of relative portfolio values over the test period"""
-    pass
+def play_trading_strategy(y_true: np.ndarray, y_pred: np.ndarray, allow_short: bool = False) -> np.ndarray:
+    """Returns the array of relative portfolio values over the test period
+    y_true.shape = (..., timesteps): true prices of a batch of instruments
+    y_pred.shape = (..., timesteps) or (..., timesteps, horizons): prices forecasted at each timestep for the next one(s)
 
+    At each timestep, we go long if the next predicted price (first horizon) is above the current one,
+    short if `allow_short` (flat otherwise) if below. Returns portfolio values of shape (..., timesteps), starting at 1.
+    Vectorized over instruments and timesteps: no Python loop.
+    """
+    # $CHALLENGIFY_BEGIN
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    if y_pred.ndim == y_true.ndim + 1:
+        y_pred = y_pred[..., 0]
+    signal = np.sign(y_pred[..., :-1] - y_true[..., :-1])
+    positions = signal if allow_short else np.maximum(signal, 0)
+    returns = y_true[..., 1:] / y_true[..., :-1] - 1
+    values = np.ones(y_true.shape)
+    np.cumprod(1 + positions * returns, axis=-1, out=values[..., 1:])
+    return values
+    # $CHALLENGIFY_END
 
-def return_on_investment(played_trading_strategy: np.ndarray) -> float:
-    """Returns the ROI of an investment strategy"""
-    pass
 
+def return_on_investment(played_trading_strategy: np.ndarray) -> Union[float, np.ndarray]:
+    """Returns the ROI of an investment strategy (one per instrument if a batch of strategies is given)"""
+    # $CHALLENGIFY_BEGIN
+    roi = played_trading_strategy[..., -1] / played_trading_strategy[..., 0] - 1
+    return float(roi) if np.ndim(roi) == 0 else roi
+    # $CHALLENGIFY_END
 
-def sharpe_ratio(played_trading_strategy: np.ndarray) -> float:
-    """Returns the Sharpe Ratio (Return on Investment / Volatility) of an investment strategy"""
-    pass
+
+def sharpe_ratio(played_trading_strategy: np.ndarray, periods_per_year: int = None) -> Union[float, np.ndarray]:
+    """Returns the Sharpe Ratio (Return on Investment / Volatility) of an investment strategy
+    (one per instrument if a batch of strategies is given), annualized if `periods_per_year` is given
+    """
+    # $CHALLENGIFY_BEGIN
+    returns = played_trading_strategy[..., 1:] / played_trading_strategy[..., :-1] - 1
+    mean = returns.mean(axis=-1)
+    std = returns.std(axis=-1)
+    sharpe = np.divide(mean, std, out=np.zeros_like(mean), where=std > 0)
+    if periods_per_year is not None:
+        sharpe = sharpe * np.sqrt(periods_per_year)
+    return float(sharpe) if np.ndim(sharpe) == 0 else sharpe
+    # $CHALLENGIFY_END
@@ -1,14 +1,30 @@
-import tensorflow as tf
-from tensorflow.keras.layers import Dense, SimpleRNN, Reshape, Lambda, Input
-from tensorflow.keras import Model
-from ts_boilerplate.params import DATA, TRAIN
+from ts_boilerplate.baselines import BaselineModel, get_baseline
+from ts_boilerplate.params import DATA, FIT, MODEL, TRAIN
+from ts_boilerplate.profiling import timed
+from ts_boilerplate.sequence import WindowedSequence
 
-# TODO: Should we add here the preprocessing? into a class called "pipeline"?
-# TODO: Should we refacto in a class ? Probably!
+# TensorFlow is imported inside the functions building or fitting keras models only: importing this module
+# (hence `main.py`) stays fast, and NumPy baselines never load it
+# Preprocessing (scaling) and compiled predict are wrapped around this model in `pipeline.TsPipeline`,
+# which `fit_model` and `predict_output` also accept in place of a keras model
 
 
-def get_model(X_train, y_train):
-    """Instanciate, compile and and return the model of your choice"""
+@timed("get_model")
+def get_model(X_train, y_train, baseline: str = None, pipeline: bool = False):
+    """Instanciate, compile and and return the model of your choice
+    `baseline` (by default `MODEL['baseline']`) returns one of the NumPy baselines of `baselines.py` instead
+    `pipeline=True` wraps the keras model into a `pipeline.TsPipeline` (scaling + compiled predict)
+    """
+    baseline = MODEL['baseline'] if baseline is None else baseline
+    if baseline is not None:
+        return get_baseline(baseline, X_train, y_train, **{key: value for key, value in MODEL.items() if key != 'baseline'})
+    if pipeline:
+        from ts_boilerplate.pipeline import TsPipeline
+        return TsPipeline(X_train, y_train)
+    import tensorflow as tf
+    from tensorflow.keras.layers import Dense, SimpleRNN, Reshape, Lambda, Input
+    from tensorflow.keras import Model
+
     # $CHALLENGIFY_BEGIN
 
     # BASELINE: PREDICT LAST VALUE - ZERO TRAINABLE WEIGHTS
@@ -35,29 +51,75 @@ def get_model(X_train, y_train):
     # $CHALLENGIFY_END
 
 
-def fit_model(model, X_train, y_train, **kwargs):
-    """Fit the `model` object, including preprocessing if needs be"""
+@timed("fit_model", track_retraces=True)
+def fit_model(model, X_train, y_train=None, **kwargs):
+    """Fit the `model` object, including preprocessing if needs be
+    `X_train` may also be a `WindowedSequence`, in which case `y_train` is not needed
+    """
+    if isinstance(model, BaselineModel) or hasattr(model, "predict_batch"):
+        # A NumPy baseline, or a `pipeline.TsPipeline` (which scales data before fitting its own model)
+        return model.fit(X_train, y_train, **kwargs)
+    import tensorflow as tf
+
     # $CHALLENGIFY_BEGIN
     verbose = kwargs.get("verbose", 0)
     es = tf.keras.callbacks.EarlyStopping(monitor='val_loss',
-                                          patience=2,
+                                          patience=FIT['patience'],
                                           verbose=verbose,
                                           mode='min',
                                           restore_best_weights=True)
+    if isinstance(X_train, WindowedSequence):
+        # Mini-batches are gathered on the fly: (X, y) are never fully materialized
+        train_seq, val_seq = X_train.split(1 - FIT['validation_split'])
+        history = model.fit(train_seq.as_dataset(),
+                            epochs=FIT['epochs'],
+                            validation_data=val_seq.as_dataset(shuffle=False),
+                            callbacks=[es],
+                            verbose=verbose)
+        return history
     history = model.fit(X_train,
                         y_train,
-                        epochs=50,
-                        batch_size=16,
-                        validation_split=0.3,
+                        epochs=FIT['epochs'],
+                        batch_size=FIT['batch_size'],
+                        validation_split=FIT['validation_split'],
                         callbacks=[es],
                         verbose=verbose)
     return history
     # $CHALLENGIFY_END
 
 
+@timed("fine_tune_model", track_retraces=True)
+def fine_tune_model(model, X_train, y_train, epochs: int = 1, **kwargs):
+    """Keep training an already fitted `model` on a few new samples, starting from its current weights
+    (no early stopping nor validation split: used by incremental backtests)
+    """
+    if isinstance(model, BaselineModel):
+        return model.partial_fit(X_train, y_train)
+    if hasattr(model, "predict_batch"):
+        # A `pipeline.TsPipeline`: fine-tunes its own model, keeping its scaling statistics
+        return model.partial_fit(X_train, y_train, epochs=epochs, **kwargs)
+    verbose = kwargs.get("verbose", 0)
+    history = model.fit(X_train,
+                        y_train,
+                        epochs=epochs,
+                        batch_size=FIT['batch_size'],
+                        verbose=verbose)
+    return history
+
+
+@timed("predict_output", track_retraces=True)
 def predict_output(model, X_test):
-    """Return y_test. Include preprocessing if needs be"""
+    """Return y_test. Include preprocessing if needs be
+    `X_test` may also be a `WindowedSequence`: predictions then follow its chronological order
+    """
+    if isinstance(model, BaselineModel):
+        return model.predict(X_test)
+    if hasattr(model, "predict_batch"):
+        # A `pipeline.TsPipeline`: compiled predict, traced once whatever the batch size
+        return model.predict_batch(X_test)
     # $CHALLENGIFY_BEGIN
+    if isinstance(X_test, WindowedSequence):
+        X_test = X_test.as_dataset(shuffle=False)
     y_pred = model.predict(X_test)
     return y_pred
     # $CHALLENGIFY_END
@@ -0,0 +1,164 @@
+"""Cross-validate many series at once (e.g. one per SKU), instead of calling `main.cross_validate` on each of them
+
+Series are stacked in a 3D-array of shape (n_series, n_timesteps, n_features), all sharing the same folds (see `folds.py`).
+(X, y) windows are gathered across all series at once, by index arithmetic, to either:
+    - train one global model on the windows of all series (`mode='global'`)
+    - or train one local model per series (`mode='local'`), typically a NumPy baseline of `baselines.py`
+Folds (and chunks of series in local mode) are spread over a pool of worker processes sharing the 3D-array.
+"""
+
+import os
+import numpy as np
+from ts_boilerplate import parallel
+from ts_boilerplate.dataprep import load_data
+from ts_boilerplate.folds import generate_folds
+from ts_boilerplate.metrics import mae, mape
+from ts_boilerplate.model import fit_model, get_model, predict_output
+from ts_boilerplate.params import CROSS_VAL, DATA, TRAIN
+from ts_boilerplate.sequence import squeeze_samples
+from ts_boilerplate.windowing import get_window_starts
+from typing import List, Tuple, Union
+
+MODES = ('global', 'local')
+
+
+def load_series(source: Union[np.ndarray, str]) -> Tuple[np.ndarray, List[str]]:
+    """Returns (data, names): the 3D-array of all series, and the name of each of them
+    `source` is either a 3D-array (series are named after their index) or a directory of `.csv`/`.npy` files
+    of equal shapes, each holding one 2D series as read by `dataprep.load_data` (series are named after their file)
+    """
+    if not isinstance(source, str):
+        assert np.ndim(source) == 3, "series should be stacked in a 3D-array (n_series, n_timesteps, n_features)"
+        return source, [str(i) for i in range(len(source))]
+
+    files = {}
+    for filename in sorted(os.listdir(source)):
+        name, extension = os.path.splitext(filename)
+        # A CSV takes precedence over the `.npy` cache `load_data` writes next to it
+        if extension == '.csv' or (extension == '.npy' and name not in files):
+            files[name] = os.path.join(source, filename)
+    if not files:
+        raise ValueError(f"no .csv or .npy series found in {source}")
+    series = [load_data(path) for path in files.values()]
+    shapes = {s.shape for s in series}
+    if len(shapes) > 1:
+        raise ValueError(f"all series should have the same shape, got {sorted(shapes)}")
+    return np.stack(series), list(files)
+
+
+def gather_series_windows(data: np.ndarray,
+                          series_idx: np.ndarray,
+                          starts: np.ndarray,
+                          input_length: int,
+                          output_length: int,
+                          horizon: int,
+                          **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+    """Gather the (X, y) windows starting at timesteps `starts` of series `series_idx` of the 3D `data`
+    Same as `windowing.gather_windows`, with one more leading index: the series of each window
+    """
+    X_idx = starts[:, None] + np.arange(input_length)
+    y_idx = starts[:, None] + input_length + horizon - 1 + np.arange(output_length)
+    X = data[series_idx[:, None], X_idx]
+    y = data[series_idx[:, None], y_idx][..., DATA['target_column_idx']]
+    return X, squeeze_samples(y)
+
+
+def _windows(data: np.ndarray, series: np.ndarray, starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(X, y) windows of all `series` at all `starts`, ordered series after series"""
+    return gather_series_windows(data, np.repeat(series, len(starts)), np.tile(starts, len(series)), **TRAIN)
+
+
+def evaluate_fold(data: np.ndarray,
+                  fold: Tuple[slice, slice],
+                  series: np.ndarray,
+                  mode: str = 'global',
+                  baseline: str = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Train and test on the (train_slice, test_slice) `fold` (see `folds.py`) of each of `series` (indexes in `data`)
+    Returns the test (MAE, MAPE) of each series, as two 1D-arrays
+    """
+    train_slice, test_slice = fold
+    assert np.isnan(data[series, train_slice]).sum() == 0 and np.isnan(data[series, test_slice]).sum() == 0
+    train_starts = train_slice.start + get_window_starts(train_slice.stop - train_slice.start, **TRAIN)
+    test_starts = test_slice.start + get_window_starts(test_slice.stop - test_slice.start, **TRAIN)
+
+    if mode == 'global':
+        X_train, y_train = _windows(data, series, train_starts)
+        model = get_model(X_train, y_train, baseline=baseline)
+        fit_model(model, X_train, y_train)
+        X_test, y_test = _windows(data, series, test_starts)
+        y_pred = predict_output(model, X_test)
+    else:
+        y_test, y_pred = [], []
+        for s in series:
+            X_train, y_train = _windows(data, np.array([s]), train_starts)
+            model = get_model(X_train, y_train, baseline=baseline)
+            fit_model(model, X_train, y_train)
+            X_test, y_test_s = _windows(data, np.array([s]), test_starts)
+            y_test.append(y_test_s)
+            y_pred.append(predict_output(model, X_test))
+        y_test, y_pred = np.concatenate(y_test), np.concatenate(y_pred)
+
+    # Windows are ordered series after series
+    y_test = y_test.reshape(len(series), len(test_starts), *y_test.shape[1:])
+    y_pred = y_pred.reshape(y_test.shape)
+    return (np.array([mae(y_test[i], y_pred[i]) for i in range(len(series))]),
+            np.array([mape(y_test[i], y_pred[i]) for i in range(len(series))]))
+
+
+def _evaluate_fold_in_worker(fold: Tuple[slice, slice], series: np.ndarray, mode: str, baseline: str):
+    """Run `evaluate_fold` on the 3D-array shared with this worker (see `parallel.get_worker_pool`, which also caps
+    its TF threads and sets the params of the parent), in a fresh keras session
+    """
+    parallel.clear_keras_session()
+    return evaluate_fold(parallel._data, fold, series, mode=mode, baseline=baseline)
+
+
+def cross_validate_series(source: Union[np.ndarray, str],
+                          mode: str = 'global',
+                          baseline: str = None,
+                          n_jobs: int = 1,
+                          n_chunks: int = None):
+    """Cross-validate all series of `source` (a 3D-array or a directory, see `load_series`) on the folds of `CROSS_VAL`
+    - `mode='global'` trains one model per fold on all series, `mode='local'` one model per series and per fold
+    - `baseline` selects a NumPy baseline of `baselines.py` (by default `MODEL['baseline']`, see `model.get_model`)
+    - `n_jobs` > 1 spreads folds over worker processes (-1 to use all CPU cores). In local mode, series are also
+      split into `n_chunks` chunks (4 per worker by default), so that a single fold keeps all workers busy
+
+    Returns a tidy pandas DataFrame with one row per series and per fold, and columns
+    `series`, `fold`, `fold_start`, `fold_stop`, `mae` and `mape`
+    """
+    import pandas as pd
+
+    if mode not in MODES:
+        raise ValueError(f"mode should be one of {MODES}, got {mode}")
+    data, names = load_series(source)
+    folds = list(generate_folds(data.shape[1], **CROSS_VAL, **TRAIN))
+    n_jobs = parallel.get_n_jobs(n_jobs)
+
+    if mode == 'local':
+        n_chunks = min(len(data), 4 * n_jobs if n_chunks is None else n_chunks)
+        chunks = np.array_split(np.arange(len(data)), n_chunks)
+    else:
+        chunks = [np.arange(len(data))]
+    tasks = [(i, fold, series) for i, fold in enumerate(folds) for series in chunks]
+
+    if n_jobs == 1:
+        results = [evaluate_fold(data, fold, series, mode=mode, baseline=baseline) for _, fold, series in tasks]
+    else:
+        with parallel.get_worker_pool(data, min(n_jobs, len(tasks))) as executor:
+            results = list(executor.map(_evaluate_fold_in_worker,
+                                        [fold for _, fold, _ in tasks],
+                                        [series for _, _, series in tasks],
+                                        [mode] * len(tasks),
+                                        [baseline] * len(tasks)))
+
+    names = np.asarray(names)
+    tables = []
+    for (i, (train_slice, test_slice), series), (mae_series, mape_series) in zip(tasks, results):
+        tables.append(pd.DataFrame(dict(series=names[series],
+                                        fold=i,
+                                        fold_start=train_slice.start,
+                                        fold_stop=test_slice.stop,
+                                        mae=mae_series,
+                                        mape=mape_series)))
+    return pd.concat(tables, ignore_index=True)
@@ -0,0 +1,143 @@
+"""Train cross-validation folds in parallel worker processes
+
+The 2D time-series is copied once into shared memory (or directly memory-mapped by workers when it comes from
+`dataprep.load_data`): each worker only receives (train_slice, test_slice) fold index ranges, instead of a pickled copy of every fold array.
+Workers are spawned, hence re-import `params.py`: the params dicts of the parent are sent to them once, when the pool starts.
+"""
+
+import os
+import sys
+import time
+import multiprocessing as mp
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from ts_boilerplate import params
+from typing import Dict, Iterator, List, Tuple
+
+# Set in each worker by `_init_worker`
+_shm = None
+_data = None
+
+# Params dicts of `params.py` which may be changed at runtime, e.g. by tests or `search.override_params`
+PARAMS = ('DATA', 'TRAIN', 'CROSS_VAL', 'FIT', 'MODEL')
+
+
+def get_n_jobs(n_jobs: int) -> int:
+    """Returns the number of worker processes to use, `n_jobs=-1` meaning one per CPU core"""
+    return os.cpu_count() if n_jobs in (None, -1) else n_jobs
+
+
+def get_params() -> Dict[str, dict]:
+    """Returns a copy of the params dicts of `params.py`, as currently set in this process"""
+    return {name: dict(getattr(params, name)) for name in PARAMS}
+
+
+def set_params(snapshot: Dict[str, dict]):
+    """Set the params dicts of `params.py` in place (modules importing them share the same dicts) from a `get_params` snapshot"""
+    for name, values in snapshot.items():
+        getattr(params, name).clear()
+        getattr(params, name).update(values)
+
+
+def _init_worker(shm_name: str,
+                 shape: Tuple[int],
+                 dtype: str,
+                 n_threads: int,
+                 mmap: Tuple[str, int] = None,
+                 params_snapshot: Dict[str, dict] = None):
+    """Attach the shared time-series and cap TF threads so that workers don't oversubscribe cores
+    `mmap=(filename, offset)` memory-maps the series from its file instead of attaching shared memory
+    `params_snapshot` (see `get_params`) sets the params of the parent, which a spawned worker would otherwise reset
+    to the defaults of `params.py`
+    """
+    global _shm, _data
+    if params_snapshot is not None:
+        set_params(params_snapshot)
+    os.environ["OMP_NUM_THREADS"] = str(n_threads)
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(n_threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    if mmap is not None:
+        filename, offset = mmap
+        _data = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape)
+        return
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    _data = np.ndarray(shape, dtype=dtype, buffer=_shm.buf)
+    _data.flags.writeable = False
+
+
+@contextmanager
+def get_worker_pool(data: np.ndarray, n_jobs: int) -> Iterator[ProcessPoolExecutor]:
+    """Yields a pool of `n_jobs` worker processes, in which the module-level `_data` is a read-only `data`,
+    and params are those of this process when the pool starts (see `get_params`)
+    `data` is copied once into shared memory, unless it is a whole memory-mapped `.npy` file, which workers map directly
+    """
+    n_threads = max(1, os.cpu_count() // n_jobs)
+    # A whole memory-mapped .npy file is shared through the page cache: no need for any copy
+    mmap = None
+    if isinstance(data, np.memmap) and data.filename is not None and data.flags.c_contiguous \
+            and os.path.getsize(data.filename) == data.offset + data.nbytes:  # Slices of a memmap keep a stale offset
+        mmap = (data.filename, data.offset)
+    data = np.ascontiguousarray(data)
+    shm = shared_memory.SharedMemory(create=True, size=1 if mmap else max(data.nbytes, 1))
+    try:
+        if mmap is None:
+            np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data
+        # "spawn" gives each worker its own fresh TF runtime, whereas forking an initialized TF may deadlock
+        with ProcessPoolExecutor(max_workers=n_jobs,
+                                 mp_context=mp.get_context("spawn"),
+                                 initializer=_init_worker,
+                                 initargs=(shm.name, data.shape, data.dtype.str, n_threads, mmap, get_params())) as executor:
+            yield executor
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def clear_keras_session():
+    """Reset keras global state between the tasks of a worker, only if a previous task loaded TensorFlow
+    (NumPy baselines never do)
+    """
+    if "tensorflow" in sys.modules:
+        sys.modules["tensorflow"].keras.backend.clear_session()
+
+
+def _train_fold(fold: Tuple[slice, slice],
+                print_metrics: bool,
+                cache_dir: str = None,
+                data_hash: str = None) -> Tuple[float, float]:
+    """Train on `_data[train_slice]` and test on `_data[test_slice]` in a fresh TF session
+    Returns (metrics_fold, wall time in seconds)
+    """
+    from ts_boilerplate.main import train
+    from ts_boilerplate.cache import FoldCache
+
+    clear_keras_session()
+    tic = time.perf_counter()
+    cache = None if cache_dir is None else FoldCache(cache_dir)
+    metrics_fold = train(_data, print_metrics=print_metrics, cache=cache, data_hash=data_hash, fold=fold)
+    return metrics_fold, time.perf_counter() - tic
+
+
+def train_folds_in_parallel(data: np.ndarray,
+                            folds: List[Tuple[slice, slice]],
+                            n_jobs: int = -1,
+                            print_metrics: bool = False,
+                            cache_dir: str = None,
+                            data_hash: str = None) -> Tuple[List[float], List[float]]:
+    """Train each (train_slice, test_slice) fold of `folds` (see `folds.py`) in a pool of `n_jobs` processes
+    Returns (metrics_cv, fold_times), both in fold order
+    `cache_dir` and `data_hash` (hash of the whole `data`) let workers share a `cache.FoldCache`
+    """
+    n_jobs = min(get_n_jobs(n_jobs), len(folds))
+    with get_worker_pool(data, n_jobs) as executor:
+        results = list(executor.map(_train_fold,
+                                    folds,
+                                    [print_metrics] * len(folds),
+                                    [cache_dir] * len(folds),
+                                    [data_hash] * len(folds)))
+
+    metrics_cv = [metrics_fold for metrics_fold, _ in results]
+    fold_times = [fold_time for _, fold_time in results]
+    return metrics_cv, fold_times
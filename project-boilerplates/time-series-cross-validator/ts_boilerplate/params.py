@@ -8,6 +8,7 @@ API_KEY = os.getenv('API_KEY')
 ## DIR PARAMS
 ROOT_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
 DATA_RAW_CSV_PATH = os.path.join(ROOT_DIR, 'data', 'raw', 'data.csv')
+CACHE_DIR = os.path.join(ROOT_DIR, 'cache') # On-disk cache of folds, windows, fitted model weights and predictions (see cache.py)
 
 # 👇 Please fill these global variable below very carefully, in order to create tests related to your problem👇
 # cf: https://github.com/lewagon/data-images/blob/master/DL/time-series-covariates.png?raw=true
@@ -29,4 +30,20 @@ TRAIN = dict(
 CROSS_VAL = dict(
     fold_length = 200,
     fold_stride = 100,
+    method = 'sliding', # 'sliding', 'expanding' (train from timestep 0) or 'purged' (no timestep shared by train and test), see folds.py
+    embargo = 0, # Timesteps left out between train and test, for the 'purged' method
+)
+
+FIT = dict(
+    epochs = 50, # Maximum number of epochs of the keras model of model.py
+    patience = 2, # Number of epochs without improvement of the validation loss before early stopping
+    batch_size = 16, # Mini-batch size when fitting on (X, y) arrays (a WindowedSequence keeps its own batch size)
+    validation_split = 0.3, # Ratio of the training windows kept for early stopping
+)
+
+MODEL = dict(
+    baseline = None, # None for the keras model of model.py, or the name of a NumPy baseline of baselines.py, e.g. 'last_value', 'seasonal_naive', 'moving_average', 'drift', 'linear_ar'
+    seasonality = 1, # Season length of the 'seasonal_naive' baseline
+    window = None, # Number of past timesteps averaged by the 'moving_average' baseline (None for input_length)
+    ridge = 0., # L2 regularization of the 'linear_ar' baseline
 )
@@ -0,0 +1,167 @@
+"""Full forecasting pipeline: preprocessing (scaling) + model of `model.py` + compiled predict, in one object"""
+
+import json
+import numpy as np
+from ts_boilerplate.model import fine_tune_model, fit_model, get_model
+from ts_boilerplate.params import DATA
+from ts_boilerplate.sequence import WindowedSequence
+from typing import List, Tuple
+
+
+class TsPipeline:
+    """Scale inputs, forecast with the model of `model.get_model`, and unscale outputs
+
+    - Scaling statistics (mean and std of each column) are learnt on the training set only
+    - Predictions go through a `tf.function` with a fixed input signature: scaling, forward pass
+      and unscaling are fused in a single graph, traced once, whatever the batch size
+    - Fitting again (e.g. at each retrain of a backtest) resets the model to its initial weights and optimizer state,
+      and updates the scaling statistics in place: the model and its compiled functions are never rebuilt nor retraced
+    - `save` writes a single `.npz` artifact (statistics + weights), which `TsPipeline.load` reads back in tens of
+      milliseconds, mostly spent rebuilding the keras model (see `tests/benchmarks/test_bench_pipeline.py`)
+
+    Built from one batch `(X_sample, y_sample)` if given (as `model.get_model(..., pipeline=True)` does), else on first fit
+    """
+
+    def __init__(self, X_sample: np.ndarray = None, y_sample: np.ndarray = None):
+        self.model = None
+        self.X_mean = None
+        self.X_std = None
+        self.X_shape = None  # Shape of one X sample (input_length, n_features)
+        self.y_shape = None  # Shape of one y sample (as squeezed by get_X_y)
+        self.fitted = False
+        self._predict_fn = None
+        if X_sample is not None:
+            self._build(X_sample, y_sample)
+
+    def _fit_scaler(self, X):
+        """Learn the mean and std of each column of the training set"""
+        values = X.data if isinstance(X, WindowedSequence) else X
+        values = np.asarray(values).reshape(-1, values.shape[-1])
+        self._set_stats(values.mean(axis=0), np.maximum(values.std(axis=0), 1e-7))
+
+    def _set_stats(self, X_mean: np.ndarray, X_std: np.ndarray):
+        """Set scaling statistics, and the variables the compiled predict function reads them from"""
+        self.X_mean = np.asarray(X_mean, dtype=np.float32)
+        self.X_std = np.asarray(X_std, dtype=np.float32)
+        if self.model is not None:
+            y_mean, y_std = self._y_stats()
+            for variable, value in zip(self._stats, (self.X_mean, self.X_std, y_mean, y_std)):
+                variable.assign(value)
+
+    def _y_stats(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the mean and std of targets, broadcast to the shape of one y sample"""
+        output_length = int(np.prod(self.y_shape)) // DATA['n_targets']
+        y_mean = np.broadcast_to(self.X_mean[DATA['target_column_idx']], (output_length, DATA['n_targets']))
+        y_std = np.broadcast_to(self.X_std[DATA['target_column_idx']], (output_length, DATA['n_targets']))
+        return y_mean.reshape(self.y_shape), y_std.reshape(self.y_shape)
+
+    def _scale(self, X, y=None):
+        """Returns scaled (X, y), or a scaled WindowedSequence"""
+        if isinstance(X, WindowedSequence):
+            scaled = WindowedSequence((X.data - self.X_mean) / self.X_std,
+                                      shuffle=X.shuffle,
+                                      batch_size=X.batch_size,
+                                      starts=X.starts,
+                                      seed=X.seed,
+                                      check_nan=False,
+                                      **X.window_params)
+            return scaled, None
+        X = (np.asarray(X) - self.X_mean) / self.X_std
+        if y is not None:
+            y_mean, y_std = self._y_stats()
+            y = (np.asarray(y) - y_mean) / y_std
+        return X, y
+
+    def _build(self, X_sample: np.ndarray, y_sample: np.ndarray):
+        """Instantiate the model and its compiled predict function from one batch of (X, y)"""
+        import tensorflow as tf
+
+        self.X_shape = tuple(np.shape(X_sample)[1:])
+        self.y_shape = tuple(np.shape(y_sample)[1:])
+        self.model = get_model(X_sample, y_sample)
+        self._initial_weights = self.model.get_weights()
+        # Statistics are variables of the graph, not constants: refitting the scaler does not retrace it
+        n_features = self.X_shape[-1]
+        self._stats = [tf.Variable(np.zeros(n_features, np.float32), trainable=False),
+                       tf.Variable(np.ones(n_features, np.float32), trainable=False),
+                       tf.Variable(np.zeros(self.y_shape, np.float32), trainable=False),
+                       tf.Variable(np.ones(self.y_shape, np.float32), trainable=False)]
+        if self.X_mean is not None:
+            self._set_stats(self.X_mean, self.X_std)
+        X_mean, X_std, y_mean, y_std = self._stats
+        model = self.model
+
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None, *self.X_shape), dtype=tf.float32)])
+        def predict_fn(X):
+            y_scaled = model((X - X_mean) / X_std, training=False)
+            return y_scaled * y_std + y_mean
+
+        self._predict_fn = predict_fn
+
+    def _reset(self):
+        """Restore the initial weights and optimizer state of the model, to fit it from scratch again"""
+        self.model.set_weights(self._initial_weights)
+        optimizer = getattr(self.model, "optimizer", None)
+        if optimizer is not None:
+            for variable in optimizer.variables:
+                variable.assign(np.zeros(variable.shape, variable.dtype.as_numpy_dtype))
+
+    def fit(self, X, y=None, **kwargs):
+        """Learn scaling statistics, then fit the model on scaled (X, y) or on a scaled WindowedSequence"""
+        if self.model is None:
+            self._build(*(X[0] if isinstance(X, WindowedSequence) else (X, y)))
+        elif self.fitted:
+            self._reset()
+        self._fit_scaler(X)
+        X_scaled, y_scaled = self._scale(X, y)
+        history = fit_model(self.model, X_scaled, y_scaled, **kwargs)
+        self.fitted = True
+        return history
+
+    def partial_fit(self, X, y, epochs: int = 1, **kwargs):
+        """Keep training on new samples from the current weights, keeping the scaling statistics unchanged"""
+        if not self.fitted:
+            return self.fit(X, y, **kwargs)
+        X_scaled, y_scaled = self._scale(X, y)
+        return fine_tune_model(self.model, X_scaled, y_scaled, epochs=epochs, **kwargs)
+
+    def predict_batch(self, X) -> np.ndarray:
+        """Returns unscaled predictions for a batch of windows X of shape (n_samples, input_length, n_features),
+        or for all windows of a WindowedSequence (in chronological order)
+        """
+        if isinstance(X, WindowedSequence):
+            batches = X.subset(slice(None), shuffle=False)
+            return np.concatenate([self.predict_batch(batches[i][0]) for i in range(len(batches))])
+        return self._predict_fn(np.asarray(X, dtype=np.float32)).numpy()
+
+    def predict(self, X) -> np.ndarray:
+        """Returns unscaled predictions, for one single window of shape (input_length, n_features) or a batch"""
+        X = np.asarray(X)
+        if X.ndim == len(self.X_shape):
+            return self.predict_batch(X[None, ...])[0]
+        return self.predict_batch(X)
+
+    def get_weights(self) -> List[np.ndarray]:
+        """Returns the scaling statistics (mean and std) followed by the weights of the model"""
+        return [self.X_mean, self.X_std, *self.model.get_weights()]
+
+    def set_weights(self, weights: List[np.ndarray]):
+        """Set scaling statistics and model weights, as returned by `get_weights`: the pipeline is then fitted"""
+        self._set_stats(weights[0], weights[1])
+        self.model.set_weights(list(weights[2:]))
+        self.fitted = True
+
+    def save(self, path: str):
+        """Write shapes, scaling statistics and model weights into one single `.npz` artifact"""
+        weights = {f"weight_{i}": weight for i, weight in enumerate(self.get_weights())}
+        shapes = json.dumps(dict(X_shape=self.X_shape, y_shape=self.y_shape))
+        np.savez(path, shapes=np.array(shapes), **weights)
+
+    @classmethod
+    def load(cls, path: str) -> "TsPipeline":
+        """Rebuild a fitted pipeline from an artifact written by `save`"""
+        with np.load(path) as artifact:
+            shapes = json.loads(str(artifact["shapes"]))
+            pipeline = cls(np.zeros((1, *shapes["X_shape"])), np.zeros((1, *shapes["y_shape"])))
+            pipeline.set_weights([artifact[f"weight_{i}"] for i in range(len(artifact.files) - 1)])
+        return pipeline
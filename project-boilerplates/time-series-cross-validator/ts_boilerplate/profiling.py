@@ -0,0 +1,190 @@
+"""Opt-in profiling of the stages of `train`, `cross_validate` and `backtest`
+
+Stages of `main.py`, `dataprep.py` and `model.py` are wrapped in `timer`s (or decorated with `timed`), and count
+events with `count`. They record nothing, and cost a single global lookup, unless a profiling session is active:
+
+    with profile() as profiler:
+        cross_validate(data)
+    print(profiler.summary())
+    profiler.to_json("profile.json")
+    profiler.to_chrome_trace("trace.json")  # open in chrome://tracing or https://ui.perfetto.dev
+
+A session also samples the resident memory (RSS) of the process in a background thread, to report its peak,
+and counts TensorFlow retraces (`tf.function` tracings) of the models passed to `timer(..., model=model)`.
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator
+
+# Active Profiler, None when profiling is disabled
+_profiler = None
+_DISABLED = nullcontext()
+
+
+def _current_rss() -> int:
+    """Returns the current resident memory of this process, in bytes
+    Falls back to its peak (Unix without /proc), to psutil (e.g. on Windows) if installed, else to 0
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        # Unix only
+        import resource
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+
+def _tracing_count(model) -> int:
+    """Returns how many times the `tf.function`s of a keras model (or of a `pipeline.TsPipeline`) have been traced"""
+    count = 0
+    for name in ("train_function", "test_function", "predict_function", "_predict_fn"):
+        function = getattr(model, name, None)
+        if hasattr(function, "experimental_get_tracing_count"):
+            count += function.experimental_get_tracing_count()
+    return count
+
+
+class Profiler:
+    """Timed events, counters and RSS samples of one profiling session"""
+
+    def __init__(self, rss_interval: float = 0.01):
+        self.events = []  # (name, start_ns, duration_ns, thread id)
+        self.counters = defaultdict(int)
+        self.active = set()  # (name, thread id) of the stages being timed
+        self.rss_samples = []  # (timestamp_ns, rss in bytes)
+        self.peak_rss = _current_rss()
+        self.rss_interval = rss_interval
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def _sample_rss(self):
+        while not self._stop.wait(self.rss_interval):
+            rss = _current_rss()
+            self.peak_rss = max(self.peak_rss, rss)
+            self.rss_samples.append((time.perf_counter_ns(), rss))
+
+    def start(self):
+        if self.rss_interval:
+            self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.peak_rss = max(self.peak_rss, _current_rss())
+
+    def summary(self) -> Dict:
+        """Returns the total/mean/max wall time (s) and number of calls of each stage, counters and peak RSS"""
+        stages = {}
+        for name, _, duration_ns, _ in self.events:
+            stage = stages.setdefault(name, dict(calls=0, total_s=0., max_s=0.))
+            stage["calls"] += 1
+            stage["total_s"] += duration_ns / 1e9
+            stage["max_s"] = max(stage["max_s"], duration_ns / 1e9)
+        for stage in stages.values():
+            stage["mean_s"] = stage["total_s"] / stage["calls"]
+        return dict(stages=stages, counters=dict(self.counters), peak_rss_bytes=self.peak_rss)
+
+    def to_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def to_chrome_trace(self, path: str):
+        """Write events and RSS samples in the Chrome trace event format"""
+        pid = os.getpid()
+        trace = [dict(name=name, ph="X", ts=start_ns / 1e3, dur=duration_ns / 1e3, pid=pid, tid=tid)
+                 for name, start_ns, duration_ns, tid in self.events]
+        trace += [dict(name="rss", ph="C", ts=ts_ns / 1e3, pid=pid, args=dict(MB=rss / 2**20))
+                  for ts_ns, rss in self.rss_samples]
+        with open(path, "w") as f:
+            json.dump(dict(traceEvents=trace, displayTimeUnit="ms"), f)
+
+
+@contextmanager
+def profile(rss_interval: float = 0.01) -> Iterator[Profiler]:
+    """Enable profiling within this context. RSS is sampled every `rss_interval` seconds (0 to disable sampling)"""
+    global _profiler
+    previous = _profiler
+    _profiler = Profiler(rss_interval)
+    _profiler.start()
+    try:
+        yield _profiler
+    finally:
+        _profiler.stop()
+        _profiler = previous
+
+
+class _Timer:
+    """Times a stage, unless it is nested in a stage of the same name (e.g. `fit_model` of a `pipeline.TsPipeline`
+    fitting its own keras model), which is timed by its outermost call only. Retraces are counted at all levels
+    """
+    __slots__ = ("profiler", "name", "model", "start_ns", "traces", "key")
+
+    def __init__(self, profiler: Profiler, name: str, model=None):
+        self.profiler = profiler
+        self.name = name
+        self.model = model
+
+    def __enter__(self):
+        self.traces = _tracing_count(self.model) if self.model is not None else 0
+        self.key = (self.name, threading.get_ident())
+        if self.key in self.profiler.active:
+            self.key = None
+        else:
+            self.profiler.active.add(self.key)
+        self.start_ns = time.perf_counter_ns()
+
+    def __exit__(self, *exc):
+        duration_ns = time.perf_counter_ns() - self.start_ns
+        if self.key is not None:
+            self.profiler.active.discard(self.key)
+            self.profiler.events.append((self.name, self.start_ns, duration_ns, self.key[1]))
+        if self.model is not None:
+            self.profiler.counters["tf_retraces"] += _tracing_count(self.model) - self.traces
+
+
+def timer(name: str, model=None):
+    """Context manager timing the stage `name` when profiling is enabled
+    `model` (a keras model or a `pipeline.TsPipeline`) also counts the TF retraces it triggers in this stage
+    """
+    if _profiler is None:
+        return _DISABLED
+    return _Timer(_profiler, name, model)
+
+
+def count(name: str, n: int = 1):
+    """Add `n` to the counter `name` when profiling is enabled"""
+    if _profiler is not None:
+        _profiler.counters[name] += n
+
+
+def timed(name: str, track_retraces: bool = False) -> Callable:
+    """Decorator timing each call of a function as the stage `name` when profiling is enabled
+    With `track_retraces=True`, the first argument of the function is the model whose TF retraces are counted
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return function(*args, **kwargs)
+            with _Timer(_profiler, name, args[0] if track_retraces and args else None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
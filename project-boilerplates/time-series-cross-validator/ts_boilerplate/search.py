@@ -0,0 +1,116 @@
+"""Hyper-parameter search over the `TRAIN`, `CROSS_VAL` and `MODEL` params, by successive halving
+
+Instead of editing `params.py` and re-running `cross_validate` by hand, candidate params are overridden in place
+(see `override_params`), then cross-validated in rungs of growing budget:
+    - rung 0 scores every candidate on its first `min_folds` folds only
+    - each rung keeps the best 1/`eta` of the candidates, and multiplies the number of folds by `eta`
+    - survivors of the last rung are scored on their full cross-validation
+Trials of a rung run in a pool of worker processes, which get the params of the parent when the pool starts, and
+override those of their candidate with each trial. With a `cache_dir`, windows and predictions of the folds
+already scored by a previous rung (or a previous search) are read back from the `cache.FoldCache` instead of retrained.
+"""
+
+import math
+import itertools
+import numpy as np
+from contextlib import contextmanager
+from functools import partial
+from ts_boilerplate import parallel
+from ts_boilerplate.main import cross_validate
+from ts_boilerplate.params import CACHE_DIR, CROSS_VAL, MODEL, TRAIN
+from typing import Dict, Iterator, List, Tuple
+
+
+@contextmanager
+def override_params(**overrides) -> Iterator[None]:
+    """Temporarily set each param of `overrides` in whichever of `TRAIN`, `CROSS_VAL` or `MODEL` defines it"""
+    saved = []
+    try:
+        for key, value in overrides.items():
+            params = next((params for params in (TRAIN, CROSS_VAL, MODEL) if key in params), None)
+            if params is None:
+                raise ValueError(f"{key} is not a param of TRAIN, CROSS_VAL or MODEL")
+            saved.append((params, key, params[key]))
+            params[key] = value
+        yield
+    finally:
+        for params, key, value in reversed(saved):
+            params[key] = value
+
+
+def get_candidates(space: Dict[str, list], n_candidates: int = None, seed: int = None) -> List[dict]:
+    """Returns all combinations of the values listed in `space` (e.g. `dict(input_length=[5, 10], horizon=[1, 4])`),
+    or `n_candidates` of them sampled at random without replacement
+    """
+    keys = list(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*[space[key] for key in keys])]
+    if n_candidates is None or n_candidates >= len(grid):
+        return grid
+    idx = np.random.default_rng(seed).choice(len(grid), size=n_candidates, replace=False)
+    return [grid[i] for i in sorted(idx)]
+
+
+def score_candidate(data: np.ndarray, candidate: dict, max_folds: int = None, cache_dir: str = None) -> float:
+    """Returns the mean cross-validated metric of `data` (lower is better) with the params of `candidate`"""
+    with override_params(**candidate):
+        metrics_cv = cross_validate(data, cache_dir=cache_dir, max_folds=max_folds)
+    return float(np.mean(metrics_cv))
+
+
+def _score_candidate_in_worker(candidate: dict, max_folds: int, cache_dir: str) -> float:
+    """Run `score_candidate` on the series shared with this worker (see `parallel.get_worker_pool`)
+    The worker starts from the params of the parent, and overrides those of `candidate` itself
+    """
+    parallel.clear_keras_session()
+    return score_candidate(parallel._data, candidate, max_folds=max_folds, cache_dir=cache_dir)
+
+
+def successive_halving(data: np.ndarray,
+                       space: Dict[str, list],
+                       n_candidates: int = None,
+                       eta: int = 3,
+                       min_folds: int = 1,
+                       n_jobs: int = 1,
+                       cache_dir: str = CACHE_DIR,
+                       seed: int = None,
+                       print_metrics: bool = False) -> Tuple[dict, "pd.DataFrame"]:
+    """Search the best params of `space` (see `get_candidates`) for `data`, by successive halving
+    - `eta`: each rung keeps 1/`eta` of the candidates, scored on `eta` times more folds than the previous rung
+    - `min_folds`: number of folds of the first rung
+    - `n_jobs` > 1 scores the candidates of each rung in parallel processes (-1 to use all CPU cores)
+    - `cache_dir`: `cache.FoldCache` shared by all trials (None to disable caching)
+
+    Returns (best_params, trials): the best candidate, and a pandas DataFrame with one row per trial and columns
+    `rung`, `max_folds` (None for full cross-validation), `score`, plus one column per param of `space`
+    """
+    import pandas as pd
+
+    survivors = get_candidates(space, n_candidates, seed)
+    n_rungs = math.ceil(math.log(len(survivors), eta)) if len(survivors) > 1 else 0
+    n_jobs = min(parallel.get_n_jobs(n_jobs), len(survivors))
+    trials = []
+
+    with parallel.get_worker_pool(data, n_jobs) if n_jobs > 1 else _no_pool() as executor:
+        for rung in range(n_rungs + 1):
+            # The last rung runs full cross-validations
+            max_folds = min_folds * eta**rung if rung < n_rungs else None
+            if executor is None:
+                scores = [score_candidate(data, candidate, max_folds, cache_dir) for candidate in survivors]
+            else:
+                scores = list(executor.map(partial(_score_candidate_in_worker, max_folds=max_folds, cache_dir=cache_dir),
+                                           survivors))
+            trials += [dict(rung=rung, max_folds=max_folds, score=score, **candidate)
+                       for candidate, score in zip(survivors, scores)]
+            if print_metrics:
+                print(f"### Rung {rung}: {len(survivors)} candidates on {max_folds or 'all'} folds, "
+                      f"best score {min(scores)}")
+            # Keep the best 1/eta candidates (stable sort: ties keep their order)
+            ranking = np.argsort(scores, kind="stable")
+            survivors = [survivors[i] for i in ranking[:max(1, math.ceil(len(survivors) / eta))]]
+
+    return survivors[0], pd.DataFrame(trials)
+
+
+@contextmanager
+def _no_pool() -> Iterator[None]:
+    yield None
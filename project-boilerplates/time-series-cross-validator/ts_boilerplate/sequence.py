@@ -0,0 +1,123 @@
+"""Lazy (X, y) mini-batch generator, to be fed to models instead of fully materialized tensors"""
+
+import math
+import numpy as np
+from ts_boilerplate.windowing import NanIndex, gather_windows, get_window_starts
+from typing import Tuple
+
+
+def squeeze_samples(y: np.ndarray) -> np.ndarray:
+    """Squeeze all axes of size 1 except the sample axis (axis 0), so that batches of any size keep
+    the same shape rules as `dataprep.get_X_y`
+    """
+    return y.reshape(len(y), *[dim for dim in y.shape[1:] if dim != 1])
+
+
+class WindowedSequence:
+    """Iterable of (X, y) mini-batches sampled from a 2D time-series `data`
+
+    Only `data` and the int array of window `starts` are stored: each batch is gathered on the fly,
+    so that memory stays O(len(data)) instead of O(n_samples * input_length * n_features).
+
+    It follows the `keras.utils.Sequence` protocol (`len`, `[]`, `on_epoch_end`) and can be turned
+    into a `tf.data.Dataset` with `as_dataset()`, which is what `model.fit_model` does.
+
+    `nan_index` (see `windowing.NanIndex`) makes the NaN check O(1), and `dropna=True` drops windows containing NaNs.
+    """
+
+    def __init__(self,
+                 data: np.ndarray,
+                 input_length: int,
+                 output_length: int,
+                 horizon: int,
+                 stride: int,
+                 shuffle: bool = True,
+                 batch_size: int = 16,
+                 starts: np.ndarray = None,
+                 seed: int = None,
+                 check_nan: bool = True,
+                 nan_index: NanIndex = None,
+                 dropna: bool = False,
+                 **kwargs):
+        self.data = data
+        self.window_params = dict(input_length=input_length,
+                                  output_length=output_length,
+                                  horizon=horizon,
+                                  stride=stride)
+        if starts is None:
+            starts = get_window_starts(len(data), **self.window_params)
+        if dropna:
+            # Only drop the windows containing a NaN
+            nan_index = NanIndex(data) if nan_index is None else nan_index
+            starts = starts[nan_index.valid_windows(starts, **self.window_params)]
+        elif check_nan:
+            assert (np.isnan(data).sum() if nan_index is None else nan_index.count()) == 0
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.shuffle = shuffle
+        self.batch_size = batch_size
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._order = self._rng.permutation(len(self.starts)) if shuffle else np.arange(len(self.starts))
+
+    def __len__(self) -> int:
+        """Number of mini-batches per epoch"""
+        return math.ceil(len(self.starts) / self.batch_size)
+
+    def __getitem__(self, idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Gather the (X, y) pairs of the `idx`-th mini-batch"""
+        batch = self._order[idx * self.batch_size:(idx + 1) * self.batch_size]
+        X, y = gather_windows(self.data, self.starts[batch], **self.window_params)
+        return X, squeeze_samples(y)
+
+    def on_epoch_end(self):
+        """Reshuffle the windows between epochs"""
+        if self.shuffle:
+            self._rng.shuffle(self._order)
+
+    @property
+    def n_samples(self) -> int:
+        return len(self.starts)
+
+    def targets(self) -> np.ndarray:
+        """Returns all y in chronological order (the order predictions come out when `shuffle=False`)"""
+        _, y = gather_windows(self.data, self.starts, **self.window_params)
+        return squeeze_samples(y)
+
+    def subset(self, positions: np.ndarray, shuffle: bool = None) -> "WindowedSequence":
+        """Returns a new sequence over `self.starts[positions]`, sharing the same `data`"""
+        return WindowedSequence(self.data,
+                                shuffle=self.shuffle if shuffle is None else shuffle,
+                                batch_size=self.batch_size,
+                                starts=self.starts[positions],
+                                seed=self.seed,
+                                check_nan=False,
+                                **self.window_params)
+
+    def split(self, ratio: float) -> Tuple["WindowedSequence", "WindowedSequence"]:
+        """Split windows into two sequences, the first one holding `ratio` of them.
+        Like keras `validation_split` applied after `get_X_y`, windows are split at random if `shuffle=True`,
+        chronologically otherwise
+        """
+        positions = self._rng.permutation(self.n_samples) if self.shuffle else np.arange(self.n_samples)
+        split_idx = round(ratio * self.n_samples)
+        return self.subset(np.sort(positions[:split_idx])), self.subset(np.sort(positions[split_idx:]))
+
+    def as_dataset(self, shuffle: bool = None):
+        """Returns a `tf.data.Dataset` streaming the mini-batches of this sequence, reshuffled at every epoch"""
+        import tensorflow as tf
+
+        sequence = self if shuffle is None or shuffle == self.shuffle else self.subset(slice(None), shuffle=shuffle)
+        X_sample, y_sample = sequence[0]
+
+        def generator():
+            for idx in range(len(sequence)):
+                yield sequence[idx]
+            sequence.on_epoch_end()
+
+        dataset = tf.data.Dataset.from_generator(
+            generator,
+            output_signature=(
+                tf.TensorSpec(shape=(None, *X_sample.shape[1:]), dtype=X_sample.dtype),
+                tf.TensorSpec(shape=(None, *y_sample.shape[1:]), dtype=y_sample.dtype),
+            ))
+        return dataset.apply(tf.data.experimental.assert_cardinality(len(sequence))).prefetch(tf.data.AUTOTUNE)
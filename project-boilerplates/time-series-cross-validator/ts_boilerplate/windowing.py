@@ -0,0 +1,141 @@
+"""Zero-copy windowing engine, used to sample (X, y) pairs out of a 2D time-series
+
+Windows are returned as read-only strided views on `data`: no timestep is ever duplicated in memory,
+whatever the `input_length`. Copies only happen on request (shuffling, `copy=True`, or gathering an
+arbitrary set of windows).
+👉 illustration: https://raw.githubusercontent.com/lewagon/data-images/master/DL/rnn-1.png
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from ts_boilerplate.params import DATA
+from typing import Tuple
+
+
+def get_window_length(input_length: int, output_length: int, horizon: int, **kwargs) -> int:
+    """Returns the number of timesteps spanned by one (Xi, yi) pair, from first X to last y"""
+    return input_length + horizon - 1 + output_length
+
+
+def get_window_starts(n_timesteps: int,
+                      input_length: int,
+                      output_length: int,
+                      horizon: int,
+                      stride: int = 1,
+                      **kwargs) -> np.ndarray:
+    """Returns the 1D-array of first indexes of every (Xi, yi) pair fitting in a series of `n_timesteps`,
+    sliding `stride` timesteps after another (same sampling as `dataprep.get_X_y`)
+    """
+    window_length = get_window_length(input_length, output_length, horizon)
+    n_windows = max(n_timesteps - window_length + 1, 0)
+    return np.arange(0, n_windows, stride, dtype=np.int64)
+
+
+def get_target_columns(data: np.ndarray) -> np.ndarray:
+    """Returns the target columns of `data` (as per DATA['target_column_idx']) as a 2D-array.
+    This is a view when target indexes are evenly spaced (e.g. [0, 1]), and a copy of the targets only otherwise
+    """
+    idx = np.asarray(DATA['target_column_idx'])
+    steps = np.unique(np.diff(idx))
+    if len(idx) == 1 or (len(steps) == 1 and steps[0] > 0):
+        step = 1 if len(idx) == 1 else int(steps[0])
+        return data[:, idx[0]:idx[-1] + 1:step]
+    return data[:, idx]
+
+
+def get_windows(data: np.ndarray,
+                input_length: int,
+                output_length: int,
+                horizon: int,
+                **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns read-only views (X, y) on every window of `data` with a stride of 1, before any squeeze:
+        X.shape = (n_windows, input_length, n_covariates + n_targets)
+        y.shape = (n_windows, output_length, n_targets)
+
+    ❗️ X and y share memory with `data`: mutating `data` afterwards also mutates them
+    """
+    n_windows = len(get_window_starts(len(data), input_length, output_length, horizon))
+    targets = get_target_columns(data)
+    if n_windows == 0:
+        X = np.empty((0, input_length, data.shape[1]), dtype=data.dtype)
+        y = np.empty((0, output_length, targets.shape[1]), dtype=data.dtype)
+        return X, y
+
+    y_first = input_length + horizon - 1
+    # sliding_window_view appends the window axis last: move it back right after the sample axis
+    X = sliding_window_view(data[:n_windows + input_length - 1], input_length, axis=0)
+    y = sliding_window_view(targets[y_first:y_first + n_windows + output_length - 1], output_length, axis=0)
+    return np.moveaxis(X, -1, 1), np.moveaxis(y, -1, 1)
+
+
+def gather_windows(data: np.ndarray,
+                   starts: np.ndarray,
+                   input_length: int,
+                   output_length: int,
+                   horizon: int,
+                   **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+    """Copies the (X, y) windows beginning at each index of `starts` into new contiguous arrays, without squeeze:
+        X.shape = (len(starts), input_length, n_covariates + n_targets)
+        y.shape = (len(starts), output_length, n_targets)
+    Only the requested windows are materialized, which makes it suited to build mini-batches
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    y_first = input_length + horizon - 1
+    # Index arithmetic only touches the requested timesteps: O(len(starts)), whatever len(data)
+    X = data[starts[:, None] + np.arange(input_length)]
+    y = data[(starts + y_first)[:, None] + np.arange(output_length)][..., DATA['target_column_idx']]
+    return X, y
+
+
+class NanIndex:
+    """Prefix-sum index of the timesteps of a 2D time-series containing at least one NaN
+
+    Built once in O(len(data)), it then tells in O(1) whether any range of timesteps contains a NaN
+    (in any column, or in target columns only). Slicing it (`nan_index[start:stop]`) returns the index
+    of `data[start:stop]`, without any recomputation.
+    """
+
+    def __init__(self,
+                 data: np.ndarray = None,
+                 prefixes: Tuple[np.ndarray, np.ndarray] = None,
+                 chunk_size: int = 1_000_000):
+        if prefixes is None:
+            # Built block by block, so that memory-mapped series are never fully loaded
+            prefix = np.zeros(len(data) + 1, dtype=np.int64)
+            target_prefix = np.zeros(len(data) + 1, dtype=np.int64)
+            for start in range(0, len(data), chunk_size):
+                is_nan = np.isnan(np.asarray(data[start:start + chunk_size]))
+                prefix[start + 1:start + 1 + len(is_nan)] = is_nan.any(axis=1)
+                target_prefix[start + 1:start + 1 + len(is_nan)] = is_nan[:, DATA['target_column_idx']].any(axis=1)
+            prefixes = (np.cumsum(prefix, out=prefix), np.cumsum(target_prefix, out=target_prefix))
+        self.prefix, self.target_prefix = prefixes
+
+    def __len__(self) -> int:
+        return len(self.prefix) - 1
+
+    def __getitem__(self, key: slice) -> "NanIndex":
+        start, stop, step = key.indices(len(self))
+        assert step == 1, "NanIndex only supports contiguous slices"
+        stop = max(start, stop)
+        return NanIndex(prefixes=(self.prefix[start:stop + 1], self.target_prefix[start:stop + 1]))
+
+    def count(self, start=0, stop=None, targets_only: bool = False):
+        """Returns the number of timesteps containing a NaN in [start, stop) (only looking at target columns
+        if `targets_only`). Vectorized over arrays of bounds
+        """
+        stop = len(self) if stop is None else stop
+        prefix = self.target_prefix if targets_only else self.prefix
+        return prefix[stop] - prefix[start]
+
+    def valid_windows(self,
+                      starts: np.ndarray,
+                      input_length: int,
+                      output_length: int,
+                      horizon: int,
+                      **kwargs) -> np.ndarray:
+        """Returns the boolean mask of the windows beginning at `starts` whose X and y contain no NaN"""
+        starts = np.asarray(starts, dtype=np.int64)
+        y_first = starts + input_length + horizon - 1
+        X_is_valid = self.count(starts, starts + input_length) == 0
+        y_is_valid = self.count(y_first, y_first + output_length, targets_only=True) == 0
+        return X_is_valid & y_is_valid